@@ -0,0 +1,45 @@
+//! \file
+//! \brief C interface of the fixed-point kernels
+//!
+//! Built as a shared library, to be called from Python with ctypes (see
+//! python/fxp_kernels.py). Fixed-point images are passed as their raw storage,
+//! the kernels reinterpret them in place, no copy is made.
+//!
+
+#include "fxp_kernels.hpp"
+#include <type_traits>
+
+#ifdef _WIN32
+#define FXP_KERNELS_API extern "C" __declspec(dllexport)
+#else
+#define FXP_KERNELS_API extern "C"
+#endif
+
+static_assert(sizeof(fixed_q8_4) == sizeof(std::uint8_t) && std::is_standard_layout_v<fixed_q8_4>);
+static_assert(sizeof(fixed_q16_4) == sizeof(std::uint16_t) && std::is_standard_layout_v<fixed_q16_4>);
+
+FXP_KERNELS_API void binning_2x2_u8(const std::uint8_t* in, std::size_t in_stride, std::uint8_t* out,
+                                    std::size_t out_stride, std::size_t w, std::size_t h)
+{
+    binning_2x2(in, in_stride, out, out_stride, w, h);
+}
+
+FXP_KERNELS_API void binning_2x2_f32(const float* in, std::size_t in_stride, float* out, std::size_t out_stride,
+                                     std::size_t w, std::size_t h)
+{
+    binning_2x2(in, in_stride, out, out_stride, w, h);
+}
+
+FXP_KERNELS_API void binning_2x2_q8_4(const std::uint8_t* in, std::size_t in_stride, std::uint8_t* out,
+                                      std::size_t out_stride, std::size_t w, std::size_t h)
+{
+    binning_2x2(reinterpret_cast<const fixed_q8_4*>(in), in_stride, reinterpret_cast<fixed_q8_4*>(out), out_stride,
+                w, h);
+}
+
+FXP_KERNELS_API void binning_2x2_q16_4(const std::uint16_t* in, std::size_t in_stride, std::uint16_t* out,
+                                       std::size_t out_stride, std::size_t w, std::size_t h)
+{
+    binning_2x2(reinterpret_cast<const fixed_q16_4*>(in), in_stride, reinterpret_cast<fixed_q16_4*>(out),
+                out_stride, w, h);
+}
@@ -0,0 +1,38 @@
+//! \file
+//! \brief fixed-point kernels
+//!
+//! Kernels shared by the benchmark executable and the fxp_kernels shared library.
+//! They work on raw pointers with a row stride (in elements), so they can run on
+//! buffers owned by someone else, e.g. NumPy arrays.
+//!
+
+#pragma once
+
+#include <cstddef>
+#include <cstdint>
+#include <fpm/fixed.hpp>
+
+using fixed_q8_4 = fpm::fixed<std::uint8_t, std::uint16_t, 4>;
+using fixed_q16_4 = fpm::fixed<std::uint16_t, std::uint32_t, 6>;
+
+//! 2x2 binning of `in` into the `w` x `h` image `out`
+template<typename T>
+void binning_2x2(const T* in, std::size_t in_stride, T* out, std::size_t out_stride, std::size_t w, std::size_t h)
+{
+    for (std::size_t i = 0; i < h; ++i)
+    {
+        const T* row0 = in + (2 * i) * in_stride;
+        const T* row1 = row0 + in_stride;
+        T* row_out = out + i * out_stride;
+        for (std::size_t j = 0; j < w; ++j)
+        {
+            const auto p00 = row0[j * 2];
+            const auto p01 = row0[j * 2 + 1];
+            const auto p10 = row1[j * 2];
+            const auto p11 = row1[j * 2 + 1];
+            T p_b = p00 + p01 + p10 + p11;
+            p_b = p_b / 4;
+            row_out[j] = p_b;
+        }
+    }
+}
@@ -1,4 +1,4 @@
-#include <fpm/fixed.hpp>
+#include "fxp_kernels.hpp"
 #define STB_IMAGE_IMPLEMENTATION
 #include <stb_image.h>
 #include <iostream>
@@ -7,9 +7,6 @@
 #include <scoped_timer.hpp>
 
 
-using fixed_q8_4 = fpm::fixed<std::uint8_t, std::uint16_t, 4>;
-using fixed_q16_4 = fpm::fixed<std::uint16_t, std::uint32_t, 6>;
-
 template<typename T>
 struct image
 {
@@ -43,23 +40,7 @@ void vecwrite(const std::vector<T>&vec, std::string filepath)
 template<typename T>
 void binning_2x2_fxp(image<T>& im, image<T>&out)
 {
-    const auto w = out.width;
-    const auto h = out.height;
-    for(auto i=0u; i<h; ++i)
-    {
-        for (auto j = 0u; j < w; ++j)
-        {
-            const auto p00 = im.at(i * 2, j * 2);
-            const auto p01 = im.at(i * 2, j * 2+1);
-            const auto p10 = im.at(i * 2+1, j * 2);
-            const auto p11 = im.at(i * 2+1, j * 2+1);
-            T p_b = p00 + p01 + p10 + p11;
-            p_b = p_b / 4;
-            out.set(i, j, p_b);
-        }
-    }
-
-
+    binning_2x2(im.pixels.data(), im.width, out.pixels.data(), out.width, out.width, out.height);
 }
 
 const int trycount = 400;
@@ -0,0 +1,89 @@
+"""
+ctypes bindings of the C++ fixed-point kernels (fxp_kernels shared library)
+
+Build the library with CMake from the repository root, e.g.
+
+    cmake -B build -DCMAKE_BUILD_TYPE=Release && cmake --build build --target fxp_kernels
+
+The library is looked up in the usual CMake build directories, or at the path in the
+FXP_KERNELS_LIB environment variable. Kernels run directly on the NumPy buffers;
+fixed-point images are passed as their raw storage (uint8 for q8_4, uint16 for q16_4).
+"""
+import ctypes
+import os
+import sys
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+ROOT_DIR = Path(__file__).parent.parent
+BUILD_DIRS = ["build", "build/Release", "cmake-build-release", "cmake-build-debug", "out/build"]
+
+# format -> dtype of the raw storage
+FORMATS = {
+    "u8": np.uint8,
+    "f32": np.float32,
+    "q8_4": np.uint8,
+    "q16_4": np.uint16,
+}
+
+
+def _lib_name():
+    if sys.platform == "win32":
+        return "fxp_kernels.dll"
+    elif sys.platform == "darwin":
+        return "libfxp_kernels.dylib"
+    return "libfxp_kernels.so"
+
+
+@lru_cache
+def load_library() -> ctypes.CDLL:
+    candidates = [Path(os.environ["FXP_KERNELS_LIB"])] if "FXP_KERNELS_LIB" in os.environ else []
+    candidates += [ROOT_DIR / d / _lib_name() for d in BUILD_DIRS]
+    for path in candidates:
+        if path.exists():
+            lib = ctypes.CDLL(str(path))
+            break
+    else:
+        raise OSError(f"{_lib_name()} not found, build the fxp_kernels target first")
+
+    for fmt in FORMATS:
+        fn = getattr(lib, f"binning_2x2_{fmt}")
+        fn.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p, ctypes.c_size_t, ctypes.c_size_t,
+                       ctypes.c_size_t]
+        fn.restype = None
+    return lib
+
+
+def _row_stride(im: np.ndarray) -> int:
+    """Row stride in elements, the kernels take it as a size_t"""
+    if im.ndim != 2:
+        raise ValueError(f"expected a 2D image, got {im.ndim} dimensions")
+    if im.strides[1] != im.itemsize:
+        raise ValueError("rows must be contiguous")
+    if im.strides[0] < 0 or im.strides[0] % im.itemsize:
+        raise ValueError("rows must be in increasing memory order")
+    return im.strides[0] // im.itemsize
+
+
+def binning_2x2(im: np.ndarray, fmt: str, out: np.ndarray | None = None) -> np.ndarray:
+    """2x2 binning with the C++ kernel of `fmt`, written into `out` without copies"""
+    dtype = FORMATS[fmt]
+    h, w = im.shape[0] // 2, im.shape[1] // 2
+    if out is None:
+        out = np.empty((h, w), dtype=dtype)
+    if im.dtype != dtype or out.dtype != dtype:
+        raise TypeError(f"{fmt} binning works on {np.dtype(dtype)} buffers")
+    if out.shape != (h, w):
+        raise ValueError(f"output must be {(h, w)}")
+    if not out.flags.writeable:
+        raise ValueError("output is read-only")
+
+    in_stride, out_stride = _row_stride(im), _row_stride(out)
+    fn = getattr(load_library(), f"binning_2x2_{fmt}")
+    fn(im.ctypes.data, in_stride, out.ctypes.data, out_stride, w, h)
+    return out
+
+
+__all__ = ["FORMATS", "load_library", "binning_2x2"]
@@ -12,7 +12,8 @@ Design Guidelines
 - no automatic scaling of the fixed-point number, user has to request it explicitly
   by setting the n_int and n_frac parameters
 - we implement the minimal set of operations for fixed-point math. No automatic overflow
-  or saturation
+  or saturation: on arrays, wrap/saturate/count are opt-in per format and applied in bulk
+  by FxpliteArray.resolve_overflow, when the user requests it
 - we aim to make the API as close as possible to the Fxp class from the fxpmath package
 - minimal use of functions within the fxplite object itself; mathematical operations
   are inlined where needed to avoid overhead of a function call. Do not hesitate to copy
@@ -21,18 +22,90 @@ Design Guidelines
 - results from functions that, in C or C++, could be macros/templates/const expr depending
   on bit width are stored in a cache when they have been empirically measured to be slower
   than a dict lookup
+- division, reciprocal and square root are computed like hardware does: a small seed LUT,
+  Newton-Raphson iterations in integer arithmetic, then a remainder based correction
+  so the result is the exact truncated value
+- whole arrays are handled by FxpliteArray, which stores the integers in a single numpy
+  array; conversions from/to numpy and fxpmath are single vectorized passes
 
 """
 from dataclasses import dataclass
 from functools import lru_cache
 from typing import Callable, Self
 
+import numpy as np
+
+ROUNDING_MODES = ("trunc", "round", "floor")
+OVERFLOW_MODES = ("off", "wrap", "saturate", "count")
+
 
 @lru_cache
 def fxplite_half_val(n_frac: int) -> int:
     return 1 << (n_frac-1)
 
 
+@lru_cache
+def fxplite_range(n_int: int, n_frac: int, signed: bool) -> tuple[int, int]:
+    """Smallest and largest stored int of a format"""
+    hi = 1 << (n_int + n_frac)
+    return (-hi if signed else 0), hi - 1
+
+
+
+
+# Newton-Raphson: internal precision, seed LUT size and default number of iterations.
+# The seed is good to ~6 bits, each iteration doubles the number of correct bits.
+NEWTON_PREC = 30
+NEWTON_LUT_BITS = 4
+NEWTON_ITERATIONS = 3
+
+# 1/d for d in [0.5, 1), indexed by the 4 bits after the leading one
+_RECIP_LUT = [round(2 ** NEWTON_PREC / (0.5 + (k + 0.5) / 32)) for k in range(16)]
+# 1/sqrt(d) for d in [0.25, 1), indexed by the top 4 bits (entries 0-3 are unused)
+_RSQRT_LUT = [round(2 ** NEWTON_PREC / ((max(k, 4) + 0.5) / 16) ** 0.5) for k in range(16)]
+# widest dividend/radicand and divisor of the int64 array paths, wider formats use python ints
+NP_NUM_BITS = 62
+NP_DEN_BITS = 32
+
+
+def _div_core(n: int, b: int, iterations: int = NEWTON_ITERATIONS) -> tuple[int, int]:
+    """divmod(n, b) for n >= 0, b > 0: reciprocal of b by Newton-Raphson, then correction"""
+    P = NEWTON_PREC
+    L = b.bit_length()
+    d = b << (P - L) if L <= P else b >> (L - P)
+    y = _RECIP_LUT[(d >> (P - 1 - NEWTON_LUT_BITS)) & 0xf]
+    for _ in range(iterations):
+        y = (y * ((2 << P) - ((d * y) >> P))) >> P
+
+    # each refinement of the remainder gains as many bits as the reciprocal has
+    q, r = 0, n
+    while not 0 <= r < b:
+        dq = (r * y) >> (P + L) or (-1 if r < 0 else 1)
+        q += dq
+        r -= dq * b
+    return q, r
+
+
+def _isqrt_core(m: int, iterations: int = NEWTON_ITERATIONS) -> int:
+    """floor(sqrt(m)) for m > 0: inverse square root by Newton-Raphson, then correction"""
+    P = NEWTON_PREC
+    L = m.bit_length()
+    e = L + (L & 1)
+    d = m << (P - e) if e <= P else m >> (e - P)
+    y = _RSQRT_LUT[d >> (P - NEWTON_LUT_BITS)]
+    for _ in range(iterations):
+        t = (((d * y) >> P) * y) >> P
+        y = (y * ((3 << P) - t)) >> (P + 1)
+
+    s = (d * y) >> P
+    h = e // 2
+    r = s << (h - P) if h >= P else s >> (P - h)
+
+    # Newton step on the remainder, 1 / (2 sqrt(m)) is y / 2**(P + h + 1)
+    while not r * r <= m < (r + 1) * (r + 1):
+        rem = m - r * r
+        r += (rem * y) >> (P + h + 1) or (-1 if rem < 0 else 1)
+    return r
 
 
 @dataclass
@@ -99,13 +172,22 @@ class Fxplite:
         self.stored_int >>= self.n_frac
         return self
 
-    def __divmod__(self, other):
-        raise NotImplementedError
+    def __divmod__(self, other: Self) -> tuple[Self, Self]:
+        return fxplite_divmod(self, other)
 
     def __truediv__(self, other: Self) -> Self:
-        self.stored_int /= other.stored_int
+        return fxplite_div(self, other)
+
+    def __itruediv__(self, other: Self) -> Self:
+        self.stored_int = fxplite_div(self, other).stored_int
         return self
 
+    def reciprocal(self) -> Self:
+        return fxplite_reciprocal(self)
+
+    def sqrt(self) -> Self:
+        return fxplite_sqrt(self)
+
     def __eq__(self, other: Self) -> bool:
         return self.stored_int == other.stored_int
 
@@ -119,7 +201,8 @@ class Fxplite:
         return self.stored_int <= other.stored_int
 
     def overflow(self):
-        return self.stored_int > 2 ** (self.n_int + self.n_frac)
+        lo, hi = fxplite_range(self.n_int, self.n_frac, self.signed)
+        return not lo <= self.stored_int <= hi
 
     def as_interim_t(self):
         self.n_frac *= 2
@@ -148,6 +231,340 @@ def scalar_from_fxp(f: Fxplite) -> float | int:
     return (f.stored_int >> f.n_frac) + (f.stored_int & (0xffff >> (16 - f.n_frac))) / 2 ** f.n_frac
 
 
+def fxplite_div(a: Fxplite, b: Fxplite, iterations: int = NEWTON_ITERATIONS) -> Fxplite:
+    """a / b in the format of a, truncated toward zero"""
+    if b.stored_int == 0:
+        raise ZeroDivisionError("fxplite division by zero")
+    n, d = a.stored_int << b.n_frac, b.stored_int
+    q = _div_core(abs(n), abs(d), iterations)[0]
+    if (n < 0) != (d < 0):
+        q = -q
+    return Fxplite(q, a.n_int, a.n_frac, a.signed, a.fract_mul)
+
+
+def fxplite_divmod(a: Fxplite, b: Fxplite, iterations: int = NEWTON_ITERATIONS) -> tuple[Fxplite, Fxplite]:
+    """Floored quotient and remainder of a / b like python divmod, both in the format of a"""
+    if b.stored_int == 0:
+        raise ZeroDivisionError("fxplite division by zero")
+    # both sides in units of 2**-(a.n_frac + b.n_frac)
+    n, d = a.stored_int << b.n_frac, b.stored_int << a.n_frac
+    q, r = _div_core(abs(n), abs(d), iterations)
+    if (n < 0) != (d < 0):
+        q = -q - (r != 0)
+    r = n - q * d
+    return (Fxplite(q << a.n_frac, a.n_int, a.n_frac, a.signed, a.fract_mul),
+            Fxplite(r >> b.n_frac, a.n_int, a.n_frac, a.signed, a.fract_mul))
+
+
+def fxplite_reciprocal(x: Fxplite, iterations: int = NEWTON_ITERATIONS) -> Fxplite:
+    """1 / x in the format of x, truncated toward zero"""
+    if x.stored_int == 0:
+        raise ZeroDivisionError("fxplite reciprocal of zero")
+    q = _div_core(1 << (2 * x.n_frac), abs(x.stored_int), iterations)[0]
+    return Fxplite(-q if x.stored_int < 0 else q, x.n_int, x.n_frac, x.signed, x.fract_mul)
+
+
+def fxplite_sqrt(x: Fxplite, iterations: int = NEWTON_ITERATIONS) -> Fxplite:
+    """Square root in the format of x, truncated"""
+    if x.stored_int < 0:
+        raise ValueError("fxplite square root of a negative number")
+    r = _isqrt_core(x.stored_int << x.n_frac, iterations) if x.stored_int else 0
+    return Fxplite(r, x.n_int, x.n_frac, x.signed, x.fract_mul)
+
+
+@dataclass
+class FxpliteArray:
+    """Array of fixed-point numbers sharing the same format
+
+    Arithmetic follows Fxplite: the result keeps the format of the left operand.
+    Overflow is not checked by the operations; `resolve_overflow` applies
+    `overflow_mode` to the whole array at once and adds the number of out of range
+    elements to `n_overflow`.
+    """
+    stored_int: np.ndarray
+    n_int: int
+    n_frac: int
+    signed: bool
+    fract_mul: int
+    overflow_mode: str = "off"
+    n_overflow: int = 0
+
+    def nbits(self):
+        return self.n_int + self.n_frac + int(self.signed)
+
+    @property
+    def shape(self):
+        return self.stored_int.shape
+
+    def __len__(self):
+        return len(self.stored_int)
+
+    def __getitem__(self, idx) -> Fxplite | Self:
+        v = self.stored_int[idx]
+        if np.ndim(v) == 0:
+            return Fxplite(int(v), self.n_int, self.n_frac, self.signed, self.fract_mul)
+        return FxpliteArray(v, self.n_int, self.n_frac, self.signed, self.fract_mul, self.overflow_mode)
+
+    def val(self) -> np.ndarray:
+        """Return the values as a float64 array"""
+        return to_numpy(self)
+
+    def u(self, n_int, n_frac, rounding: str = "trunc") -> Self:
+        """Change encoding without changing value, see Fxplite.u"""
+        fracdiff = self.n_frac - n_frac
+        if fracdiff < 0:
+            self.stored_int <<= -fracdiff
+        elif fracdiff > 0:
+            self.stored_int = _shift_right(self.stored_int, fracdiff, rounding)
+        self.n_int = n_int
+        self.n_frac = n_frac
+        self.fract_mul = 2 ** n_frac
+        return self
+
+    def overflow(self) -> np.ndarray:
+        """Mask of the elements out of the range of the format"""
+        lo, hi = fxplite_range(self.n_int, self.n_frac, self.signed)
+        return (self.stored_int < lo) | (self.stored_int > hi)
+
+    def resolve_overflow(self) -> Self:
+        """Apply the overflow mode to all elements, in place
+
+        - off: nothing is done, not even counting
+        - count: out of range elements are counted but kept
+        - saturate: out of range elements are counted and clipped to the range
+        - wrap: out of range elements are counted and wrapped around, like two's
+          complement hardware registers
+        """
+        mode = self.overflow_mode
+        if mode == "off":
+            return self
+        if mode not in OVERFLOW_MODES:
+            raise ValueError(f"Unknown overflow mode: {mode}")
+
+        lo, hi = fxplite_range(self.n_int, self.n_frac, self.signed)
+        x = self.stored_int
+        self.n_overflow += int(np.count_nonzero((x < lo) | (x > hi)))
+        if mode == "saturate":
+            np.clip(x, lo, hi, out=x)
+        elif mode == "wrap":
+            x -= lo
+            x &= hi - lo
+            x += lo
+        return self
+
+    def __add__(self, other: Self) -> Self:
+        return FxpliteArray(self.stored_int + other.stored_int, self.n_int, self.n_frac, self.signed, self.fract_mul,
+                            self.overflow_mode)
+
+    def __iadd__(self, other: Self) -> Self:
+        self.stored_int += other.stored_int
+        return self
+
+    def __sub__(self, other: Self) -> Self:
+        return FxpliteArray(self.stored_int - other.stored_int, self.n_int, self.n_frac, self.signed, self.fract_mul,
+                            self.overflow_mode)
+
+    def __isub__(self, other: Self) -> Self:
+        self.stored_int -= other.stored_int
+        return self
+
+    def __mul__(self, other) -> Self:
+        val = (self.stored_int * other.stored_int) >> self.n_frac
+        return FxpliteArray(val, self.n_int, self.n_frac, self.signed, self.fract_mul, self.overflow_mode)
+
+    def __imul__(self, other: Self) -> Self:
+        self.stored_int *= other.stored_int
+        self.stored_int >>= self.n_frac
+        return self
+
+    def div(self, other: Self, iterations: int = NEWTON_ITERATIONS, exact: bool = True) -> Self:
+        """self / other in the format of self, truncated toward zero
+
+        Formats too wide for int64 go through the scalar path, which is always exact.
+        """
+        d = other.stored_int
+        if not np.all(d):
+            raise ZeroDivisionError("fxplite division by zero")
+        if self.nbits() + other.n_frac > NP_NUM_BITS or other.nbits() > NP_DEN_BITS:
+            n = self.stored_int.astype(object) << other.n_frac
+            q = _div_core_obj(np.abs(n), np.abs(d).astype(object), iterations)
+        else:
+            n = self.stored_int << other.n_frac
+            q = _div_core_np(np.abs(n), np.abs(d), iterations, exact)
+        q = np.where((n < 0) != (d < 0), -q, q)
+        return FxpliteArray(q, self.n_int, self.n_frac, self.signed, self.fract_mul, self.overflow_mode)
+
+    def __truediv__(self, other: Self) -> Self:
+        return self.div(other)
+
+    def __itruediv__(self, other: Self) -> Self:
+        self.stored_int = self.div(other).stored_int
+        return self
+
+    def reciprocal(self, iterations: int = NEWTON_ITERATIONS, exact: bool = True) -> Self:
+        """1 / self in the format of self, truncated toward zero"""
+        x = self.stored_int
+        if not np.all(x):
+            raise ZeroDivisionError("fxplite reciprocal of zero")
+        if 2 * self.n_frac + 1 > NP_NUM_BITS or self.nbits() > NP_DEN_BITS:
+            q = _div_core_obj(1 << (2 * self.n_frac), np.abs(x).astype(object), iterations)
+        else:
+            n = np.full_like(x, 1 << (2 * self.n_frac))
+            q = _div_core_np(n, np.abs(x), iterations, exact)
+        return FxpliteArray(np.where(x < 0, -q, q), self.n_int, self.n_frac, self.signed, self.fract_mul,
+                            self.overflow_mode)
+
+    def sqrt(self, iterations: int = NEWTON_ITERATIONS, exact: bool = True) -> Self:
+        """Square root in the format of self, truncated"""
+        if np.any(self.stored_int < 0):
+            raise ValueError("fxplite square root of a negative number")
+        if self.nbits() + self.n_frac > NP_NUM_BITS:
+            m = self.stored_int.astype(object) << self.n_frac
+            r = np.frompyfunc(lambda v: _isqrt_core(v, iterations) if v else 0, 1, 1)(m).astype(np.int64)
+        else:
+            r = _isqrt_core_np(self.stored_int << self.n_frac, iterations, exact)
+        return FxpliteArray(r, self.n_int, self.n_frac, self.signed, self.fract_mul, self.overflow_mode)
+
+
+def _bit_length(x: np.ndarray) -> np.ndarray:
+    """int.bit_length of each element of a non-negative int64 array"""
+    _, e = np.frexp(x.astype(np.float64))
+    e = e.astype(np.int64)
+    # the conversion to float can round up to the next power of two
+    e -= (x >> np.maximum(e - 1, 0)) == 0
+    return e
+
+
+def _shift(x: np.ndarray, s: np.ndarray) -> np.ndarray:
+    """x * 2**s, s can be negative"""
+    return np.where(s >= 0, x << np.maximum(s, 0), x >> np.maximum(-s, 0))
+
+
+def _div_core_obj(n, b: np.ndarray, iterations: int = NEWTON_ITERATIONS) -> np.ndarray:
+    """_div_core on each element of object arrays of python ints, returned as int64"""
+    return np.frompyfunc(_div_core, 3, 2)(n, b, iterations)[0].astype(np.int64)
+
+
+def _div_core_np(n: np.ndarray, b: np.ndarray, iterations: int = NEWTON_ITERATIONS, exact: bool = True):
+    """Vectorized _div_core; n must be below 2**NP_NUM_BITS and b below 2**NP_DEN_BITS
+
+    With exact=False, the remainder correction is skipped and the result may be off by
+    a few units for large quotients or too few iterations.
+    """
+    P = NEWTON_PREC
+    L = _bit_length(b)
+    d = _shift(b, P - L)
+    y = np.take(_RECIP_LUT, (d >> (P - 1 - NEWTON_LUT_BITS)) & 0xf)
+    for _ in range(iterations):
+        y = (y * ((2 << P) - ((d * y) >> P))) >> P
+
+    def estimate(x):
+        # x / b, keeping x * y within 63 bits
+        t = np.maximum(_bit_length(np.abs(x)) - 32, 0)
+        return ((x >> t) * y) >> (P + L - t)
+
+    q = estimate(n)
+    if exact:
+        # each refinement of the remainder gains as many bits as the reciprocal has
+        r = n - q * b
+        while np.any(wrong := (r < 0) | (r >= b)):
+            dq = estimate(r)
+            dq = np.where(dq == 0, np.where(r < 0, -1, 1), dq) * wrong
+            q += dq
+            r -= dq * b
+    return q
+
+
+def _isqrt_core_np(m: np.ndarray, iterations: int = NEWTON_ITERATIONS, exact: bool = True):
+    """Vectorized _isqrt_core, m must be below 2**NP_NUM_BITS; zeros are returned as zeros
+
+    With exact=False, the remainder correction is skipped and the result may be off by
+    a few units for too few iterations.
+    """
+    P = NEWTON_PREC
+    L = _bit_length(m)
+    e = L + (L & 1)
+    d = _shift(m, P - e)
+    y = np.take(_RSQRT_LUT, d >> (P - NEWTON_LUT_BITS))
+    for _ in range(iterations):
+        t = (((d * y) >> P) * y) >> P
+        y = (y * ((3 << P) - t)) >> (P + 1)
+
+    r = _shift((d * y) >> P, e // 2 - P)
+    if exact:
+        # Newton step on the remainder, keeping the product within 63 bits
+        while np.any(wrong := (r * r > m) | ((r + 1) * (r + 1) <= m)):
+            rem = m - r * r
+            t = np.maximum(_bit_length(np.abs(rem)) - 32, 0)
+            dr = ((rem >> t) * y) >> (P + e // 2 + 1 - t)
+            r += np.where(dr == 0, np.where(rem < 0, -1, 1), dr) * wrong
+    return r
+
+
+def _shift_right(x: np.ndarray, n: int, rounding: str) -> np.ndarray:
+    """Divide integers by 2**n with the given rounding"""
+    if rounding == "floor":
+        return x >> n
+    elif rounding == "round":
+        return (x + (1 << (n - 1))) >> n
+    elif rounding == "trunc":
+        return np.where(x < 0, -(-x >> n), x >> n)
+    raise ValueError(f"Unknown rounding: {rounding}")
+
+
+_float_rounding = {
+    "trunc": np.trunc,
+    "floor": np.floor,
+    "round": lambda x: np.floor(x + 0.5),
+}
+
+
+def from_numpy(arr, n_int: int, n_frac: int, signed: bool = False, rounding: str = "trunc",
+               overflow: str = "off") -> FxpliteArray:
+    """Convert a numpy array to fixed-point, values are rounded to the n_frac grid
+
+    The overflow mode is applied to the converted values.
+    """
+    arr = np.asarray(arr)
+    fract_mul = 2 ** n_frac
+    if arr.dtype.kind in "iub":
+        stored_int = arr.astype(np.int64) << n_frac
+    else:
+        if rounding not in _float_rounding:
+            raise ValueError(f"Unknown rounding: {rounding}")
+        scaled = np.multiply(arr, fract_mul, dtype=np.float64)
+        stored_int = _float_rounding[rounding](scaled).astype(np.int64)
+    return FxpliteArray(stored_int, n_int, n_frac, signed, fract_mul, overflow).resolve_overflow()
+
+
+def to_numpy(x: FxpliteArray, dtype=np.float64, rounding: str = "trunc") -> np.ndarray:
+    """Convert fixed-point values to a numpy array, integer dtypes are rounded"""
+    if np.dtype(dtype).kind in "iu":
+        if x.n_frac == 0:
+            return x.stored_int.astype(dtype)
+        return _shift_right(x.stored_int, x.n_frac, rounding).astype(dtype)
+    return np.multiply(x.stored_int, 1 / x.fract_mul, dtype=dtype)
+
+
+def from_fxpmath(fxp, n_int: int | None = None, n_frac: int | None = None, rounding: str = "trunc",
+                 overflow: str = "off") -> FxpliteArray:
+    """Convert a fxpmath.Fxp to fixed-point, keeping its format unless n_int/n_frac are given"""
+    stored_int = np.asarray(fxp.val).astype(np.int64)
+    x = FxpliteArray(stored_int, fxp.n_int, fxp.n_frac, bool(fxp.signed), 2 ** fxp.n_frac, overflow)
+    if n_int is not None or n_frac is not None:
+        x.u(fxp.n_int if n_int is None else n_int, fxp.n_frac if n_frac is None else n_frac, rounding)
+    return x.resolve_overflow()
+
+
+def to_fxpmath(x: FxpliteArray):
+    """Convert to a fxpmath.Fxp of the same format, the stored integers are copied as raw values"""
+    from fxpmath import Fxp
+
+    fxp = Fxp(None, signed=x.signed, n_word=x.nbits(), n_frac=x.n_frac)
+    fxp.set_val(x.stored_int, raw=True)
+    return fxp
+
+
 def main():
     f = Fxplite(12, 3, 3, False, 2 ** 3)
     print(Fxplite(12, 2, 3, False, 2 ** 3).val())
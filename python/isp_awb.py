@@ -0,0 +1,159 @@
+import time
+
+import numpy as np
+from isp_types import BayerPattern
+
+PROXY_MODES = ("decimate", "stride")
+
+
+def awb_proxy_view(im, factor: int = 2, mode: str = "stride"):
+    """Return a reduced Bayer mosaic to estimate AWB statistics on
+
+    The output keeps the Bayer phase of the input, so it can be fed as-is to the
+    `awb` of any backend.
+
+    - decimate: keep one Bayer quad row out of `factor`, full rows are read so memory
+      access stays contiguous
+    - stride: keep one Bayer quad out of `factor` in both directions
+
+    Both modes copy the selected quads. Only a factor of 4 or more reliably saves time
+    over the full resolution pass, in particular with the numba backend, where stride
+    with factor 2 is slower than full resolution; see `awb_proxy_report`.
+    """
+    if factor == 1:
+        return im
+
+    # incomplete Bayer quads on odd sized frames are dropped
+    h, w = im.shape[0] // 2 * 2, im.shape[1] // 2 * 2
+    im = im[:h, :w]
+    if mode == "decimate":
+        return im.reshape(h // 2, 2, w)[::factor].reshape(-1, w)
+    elif mode == "stride":
+        quads = im.reshape(h // 2, 2, w // 2, 2)[::factor, :, ::factor, :]
+        return quads.reshape(quads.shape[0] * 2, quads.shape[2] * 2)
+    else:
+        raise ValueError(f"Unknown AWB proxy mode: {mode}")
+
+
+def awb_proxy(awb, im, bayer_pattern: BayerPattern, factor: int = 2, mode: str = "stride"):
+    """Compute AWB gains with the backend `awb` function, on a reduced view of `im`"""
+    return awb(awb_proxy_view(im, factor, mode), bayer_pattern)
+
+
+def _best_time_ms(f, repeat: int):
+    """Result of `f` and its best time over `repeat` runs"""
+    best = np.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter_ns()
+        result = f()
+        best = min(best, (time.perf_counter_ns() - t0) / 1e6)
+    return result, best
+
+
+def awb_proxy_report(awb, im, bayer_pattern: BayerPattern, factors=(2, 4, 8), modes=PROXY_MODES, repeat: int = 5):
+    """Compare proxy AWB gains and cost to the full resolution ones
+
+    Returns one row per (mode, factor), with the gains, their relative error, the best
+    time over `repeat` runs and the speedup over the full resolution pass.
+    """
+    (r_ref, b_ref), t_ref = _best_time_ms(lambda: awb(im, bayer_pattern), repeat)
+    report = []
+    for mode in modes:
+        for factor in factors:
+            (r_gain, b_gain), t = _best_time_ms(lambda: awb_proxy(awb, im, bayer_pattern, factor, mode), repeat)
+            report.append({
+                "mode": mode,
+                "factor": factor,
+                "r_gain": r_gain,
+                "b_gain": b_gain,
+                "r_err": abs(r_gain - r_ref) / r_ref,
+                "b_err": abs(b_gain - b_ref) / b_ref,
+                "time_ms": t,
+                "speedup": t_ref / t,
+            })
+
+    return report
+
+
+def coarse_histogram(im, bayer_pattern: BayerPattern, bit_depth: int = 10, n_bins: int = 16, factor: int = 8):
+    """Normalized per-channel (R, G, B) histogram of a strided view of the mosaic"""
+    view = awb_proxy_view(im, factor, "stride")
+    if bayer_pattern == BayerPattern.GRBG:
+        channels = view[0::2, 1::2], view[0::2, 0::2], view[1::2, 0::2]
+    else:
+        raise NotImplementedError()
+
+    shift = bit_depth - int(np.log2(n_bins))
+    hist = np.empty((3, n_bins), dtype=np.float32)
+    for k, channel in enumerate(channels):
+        counts = np.bincount((channel.ravel() >> shift).astype(np.intp), minlength=n_bins)
+        hist[k] = counts[:n_bins] / channel.size
+    return hist
+
+
+class TemporalAWB:
+    """AWB estimator for video sequences
+
+    The full statistics pass only runs when the scene changed, or when the gains are
+    older than `max_age` frames. On a scene change the new gains are used as-is;
+    refreshes of the same scene are exponentially smoothed with `alpha`, so slow
+    changes under the threshold are followed without flicker. `max_age=None` disables
+    the refreshes, and the smoothing with them.
+
+    The scene change metric is the L1 distance between coarse histograms of the current
+    frame and of the last frame the statistics were computed on; it is in [0, 2] per
+    channel, the max over channels is used.
+
+    `awb` is the backend function computing the statistics, it can be wrapped with
+    `awb_proxy` to reduce the cost of the full pass as well.
+    """
+
+    def __init__(self, awb, bayer_pattern: BayerPattern, alpha: float = 0.5, threshold: float = 0.1,
+                 max_age: int | None = 8, bit_depth: int = 10, n_bins: int = 16, hist_factor: int = 8):
+        self.awb = awb
+        self.bayer_pattern = bayer_pattern
+        self.alpha = alpha
+        self.threshold = threshold
+        self.max_age = max_age
+        self.bit_depth = bit_depth
+        self.n_bins = n_bins
+        self.hist_factor = hist_factor
+        self.reset()
+
+    def reset(self):
+        self.gains = None
+        self.ref_hist = None
+        self.age = 0
+        self.last_change = 0.0
+        self.n_full = 0
+        self.n_skipped = 0
+
+    def scene_change(self, hist) -> float:
+        if self.ref_hist is None:
+            return np.inf
+        return float(np.abs(hist - self.ref_hist).sum(axis=1).max())
+
+    def __call__(self, im):
+        hist = coarse_histogram(im, self.bayer_pattern, self.bit_depth, self.n_bins, self.hist_factor)
+        self.last_change = self.scene_change(hist)
+        stale = self.max_age is not None and self.age >= self.max_age
+
+        if self.last_change <= self.threshold and not stale:
+            self.age += 1
+            self.n_skipped += 1
+            return self.gains
+
+        r_gain, b_gain = self.awb(im, self.bayer_pattern)
+        if self.last_change > self.threshold:
+            self.gains = r_gain, b_gain
+        else:
+            a = self.alpha
+            self.gains = a * r_gain + (1 - a) * self.gains[0], a * b_gain + (1 - a) * self.gains[1]
+
+        self.ref_hist = hist
+        self.age = 0
+        self.n_full += 1
+        return self.gains
+
+
+__all__ = ["awb_proxy_view", "awb_proxy", "awb_proxy_report", "coarse_histogram", "TemporalAWB"]
@@ -0,0 +1,135 @@
+"""
+Cross-language benchmark of 2x2 binning
+
+The C++ fpm kernels (through ctypes), fxplite, numba and numpy run on identical
+inputs, built from data/camera.png like main.cpp does, and are all timed with
+isp_timings. All engines sum in the storage type, so integer sums wrap like in the
+C++ kernels and every engine returns the same result.
+"""
+from pathlib import Path
+
+import numpy as np
+from numba import njit
+
+import isp_timings
+from fxp_kernels import FORMATS
+from fxplite import FxpliteArray
+from isp_timings import time_this
+
+CAMERA_PNG = Path(__file__).parent.parent / "data/camera.png"
+
+TRY_COUNT = 100
+
+
+def make_inputs(im_u8):
+    """Same conversions as main.cpp: f32 is normalized, fixed-point formats wrap"""
+    px = im_u8.astype(np.uint32)
+    return {
+        "u8": im_u8,
+        "f32": im_u8.astype(np.float32) / 255,
+        "q8_4": (px << 4).astype(np.uint8),
+        "q16_4": (px << 6).astype(np.uint16),
+    }
+
+
+def binning_2x2_np(im, out):
+    h, w = out.shape
+    quads = im[:h * 2, :w * 2].reshape(h, 2, w, 2)
+    if im.dtype.kind == "f":
+        np.divide(quads.sum(axis=(1, 3), dtype=im.dtype), 4, out=out)
+    else:
+        np.floor_divide(quads.sum(axis=(1, 3), dtype=im.dtype), 4, out=out)
+    return out
+
+
+@njit(nogil=True)
+def binning_2x2_nb(im, out):
+    h, w = out.shape
+    for i in range(h):
+        for j in range(w):
+            # stored in the dtype of out first, so integer sums wrap
+            out[i, j] = im[2 * i, 2 * j] + im[2 * i, 2 * j + 1] + im[2 * i + 1, 2 * j] + im[2 * i + 1, 2 * j + 1]
+            out[i, j] = out[i, j] / 4
+    return out
+
+
+def binning_2x2_fxplite(im: FxpliteArray) -> FxpliteArray:
+    h, w = im.shape[0] // 2, im.shape[1] // 2
+    quads = [im[i:h * 2:2, j:w * 2:2] for i in (0, 1) for j in (0, 1)]
+    p_b = quads[0] + quads[1] + quads[2] + quads[3]
+    # the sum wraps in the format, like the storage type of the C++ kernels
+    p_b.overflow_mode = "wrap"
+    p_b.resolve_overflow()
+    # division by an integer is a shift of the stored int
+    p_b.stored_int >>= 2
+    return p_b
+
+
+ENGINES = ("cpp", "fxplite", "numba", "numpy")
+# fixed-point formats of fxplite, (n_int, n_frac) of the raw storage
+FXPLITE_FORMATS = {"q8_4": (4, 4), "q16_4": (10, 6)}
+
+
+def run(im_u8, try_count: int = TRY_COUNT, with_cpp: bool = True, timings: dict = isp_timings.timings):
+    """Time every engine on every format, timings go to `timings` as "{engine}_{format}"
+
+    numpy and numba run on the raw storage of the fixed-point formats as well, so each
+    fixed-point format is timed with all four engines.
+    """
+    inputs = make_inputs(im_u8)
+    h, w = im_u8.shape[0] // 2, im_u8.shape[1] // 2
+
+    if with_cpp:
+        import fxp_kernels
+
+        for fmt, im in inputs.items():
+            out = np.empty((h, w), dtype=im.dtype)
+            for _ in range(try_count):
+                with time_this(f"cpp_{fmt}", timings):
+                    fxp_kernels.binning_2x2(im, fmt, out)
+
+    for fmt, im in inputs.items():
+        out = np.empty((h, w), dtype=im.dtype)
+        for _ in range(try_count):
+            with time_this(f"numpy_{fmt}", timings):
+                binning_2x2_np(im, out)
+        for _ in range(try_count):
+            with time_this(f"numba_{fmt}", timings):
+                binning_2x2_nb(im, out)
+
+    for fmt, (n_int, n_frac) in FXPLITE_FORMATS.items():
+        im = FxpliteArray(inputs[fmt].astype(np.int64), n_int, n_frac, False, 2 ** n_frac)
+        for _ in range(try_count):
+            with time_this(f"fxplite_{fmt}", timings):
+                binning_2x2_fxplite(im)
+
+
+def comparison(timings: dict = isp_timings.timings) -> str:
+    """Mean time (ms) of each engine per format, the first (warm-up) run is left out"""
+    lines = [f"{'format':<8}" + "".join(f"{engine:>10}" for engine in ENGINES)]
+    for fmt in FORMATS:
+        cells = []
+        for engine in ENGINES:
+            t = timings.get(f"{engine}_{fmt}")
+            cells.append(f"{np.mean(t[1:] or t):>10.3f}" if t else f"{'-':>10}")
+        lines.append(f"{fmt:<8}" + "".join(cells))
+    return "\n".join(lines)
+
+
+def main():
+    import cv2
+    import fxp_kernels
+
+    im_u8 = cv2.imread(str(CAMERA_PNG), cv2.IMREAD_GRAYSCALE)
+    try:
+        fxp_kernels.load_library()
+        with_cpp = True
+    except OSError as e:
+        print(f"C++ kernels not available ({e}), running the Python engines only")
+        with_cpp = False
+    run(im_u8, with_cpp=with_cpp)
+    print(comparison())
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 import numpy as np
 from isp_types import BayerPattern
 from fxpmath import Fxp
+from fxplite import FxpliteArray, from_numpy, to_fxpmath
 
 buffers = {}
 
@@ -17,28 +18,25 @@ def awb(im, bayer_pattern: BayerPattern):
     else:
         return 0, 0
 
-    h, w = im.shape
-    r_avg = g_avg = b_avg = Fxp(0, dtype=DT_AVG)
-
-    two = Fxp(2, dtype=DT)
-    im_fxp = Fxp(im, dtype=DT)
-
-    for i in range(0, h, 2):
-        print(f"awb gains, line {i}")
-        for j in range(0, w, 2):
-            try:
-                r_avg += im_fxp[i + R[0], j + R[1]]
-            except OverflowError:
-                print(f"Red OverflowError at {i}, {j}")
-
-            try:
-                g_avg += (im_fxp[i + Gr[0], j + Gr[1]] + im_fxp[i + Gb[0], j + Gb[1]]) / two
-            except OverflowError:
-                print(f"Green OverflowError at {i}, {j}")
+    # overflow is audited in bulk: pixels against DT, channel sums against DT_AVG
+    im_fxp = from_numpy(im, 15, 0, signed=True, overflow="count")
+    px = im_fxp.stored_int
+    r_sum = px[R[0]::2, R[1]::2].sum()
+    g_sum = ((px[Gr[0]::2, Gr[1]::2] + px[Gb[0]::2, Gb[1]::2]) >> 1).sum()
+    b_sum = px[B[0]::2, B[1]::2].sum()
+    sums = FxpliteArray(np.array([r_sum, g_sum, b_sum]), 31, 0, True, 1, "count").resolve_overflow()
 
-            b_avg += im_fxp[i + B[0], j + B[1]]
+    if im_fxp.n_overflow:
+        print(f"awb: {im_fxp.n_overflow} pixels overflow {DT}")
+    if sums.n_overflow:
+        print(f"awb: {sums.n_overflow} channel sums overflow {DT_AVG}")
 
-    return g_avg / r_avg, g_avg / b_avg
+    # gains are s32/16, computed with the fxplite divider
+    r_sum, g_sum, b_sum = sums.stored_int
+    g = FxpliteArray(np.array([g_sum, g_sum]), 31, 0, True, 1).u(15, 16)
+    rb = FxpliteArray(np.array([r_sum, b_sum]), 31, 0, True, 1)
+    gains = to_fxpmath(g / rb)
+    return gains[0], gains[1]
 
 
 def _wb_nb(im, r_gain, b_gain, bayer_pattern: BayerPattern, out):
@@ -55,12 +53,13 @@ def _wb_nb(im, r_gain, b_gain, bayer_pattern: BayerPattern, out):
     return out_fxp
 
 
-def wb(im, r_gain, b_gain, bayer_pattern: BayerPattern):
-    global buffers
+def wb(im, r_gain, b_gain, bayer_pattern: BayerPattern, buffers=buffers):
     if "wb" not in buffers:
-        buffers["wb"] = im.copy()
+        buffers["wb"] = np.empty_like(im)
 
+    # start again from the current frame, the gains are applied in place
     out = buffers["wb"]
+    np.copyto(out, im)
     return _wb_nb(im, r_gain, b_gain, bayer_pattern, out)
 
 
@@ -140,11 +139,10 @@ def _demos_nb_grgb(im, bayer_pattern: BayerPattern, out):
             out[i + 1, j + 1, 2] = (B1 + B3) / 2
 
 
-def demos(im, bayer_pattern: BayerPattern):
-    global buffers
+def demos(im, bayer_pattern: BayerPattern, buffers=buffers):
     if "demos" not in buffers:
         h, w = im.shape
-        buffers["demos"] = Fxp(np.zeros((h, w, 3), dtype=im.dtype), dtype=DT)
+        buffers["demos"] = Fxp(np.zeros((h, w, 3), dtype=np.uint16), dtype=DT)
 
     out = buffers["demos"]
 
@@ -176,8 +174,7 @@ def _ccm_nb(im, ccm_mat, out):
                     out[i][j][k] = 1023.0
 
 
-def ccm(im, ccm_mat):
-    global buffers
+def ccm(im, ccm_mat, buffers=buffers):
     if "ccm" not in buffers:
         h, w, _ = im.shape
         buffers["ccm"] = np.zeros((h, w, 3), dtype=im.dtype)
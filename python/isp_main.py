@@ -6,24 +6,23 @@ from tqdm import tqdm
 
 import isp_types
 import isp_datasets
-from isp_timings import time_this, save_plot
+import isp_timings
+from isp_timings import save_plot
+from isp_pipeline import Pipeline
+from isp_output import FrameWriter
 
 USE_BACKEND = "fxp"
 WITH_PLOTS = True
+# estimate AWB gains on a reduced view, e.g. ("stride", 4); None for full resolution
+AWB_PROXY = None
+# write the processed frames, e.g. ("out", "npy"); None to not save them
+OUTPUT = None
 
 try_count = 10
 if try_count > 1:
     WITH_PLOTS = False
 
 
-if USE_BACKEND == "numpy":
-    from isp_np import awb, wb, demos, ccm, reset
-elif USE_BACKEND == "numba":
-    from isp_nb import awb, wb, demos, ccm, reset
-elif USE_BACKEND == "fxp":
-    from isp_fxp import awb, wb, demos, ccm, reset
-
-
 def levels(im):
     return np.min(im), np.max(im)
 
@@ -64,28 +63,18 @@ raw_image = raw_image.reshape(height, width)
 imshow(raw_image, "RAW")
 
 
-for each in tqdm(range(try_count), total=try_count):
-    reset()
-
-    with time_this("total"):
-        imshow(raw_image, "RAW")
-        # WB
-        with time_this("awb"):
-            rgain, bgain = awb(raw_image, bayer_pattern)
-        with time_this("wb"):
-            im_wb = wb(raw_image, rgain, bgain, bayer_pattern)
-        imshow(im_wb, "wb")
-
-        # DEMOS
-        with time_this("demos"):
-            im_demos = demos(im_wb, bayer_pattern)
-            # im_demos = cv2.cvtColor(im_wb.astype(np.uint16), bayer_opencv_patterns[bayer_pattern])
-        imshow(im_demos.astype("u2"), "demos grbg -> rgb")
-
-        im_demos = im_demos.astype(np.float32)
-        # CCM
-        # with time_this("ccm"):
-        #     im_ccm = ccm(im_demos, lmx)
-        # imshow(im_ccm.astype(np.uint16), "rgb->ccm")
+pipeline = Pipeline.from_config(config, USE_BACKEND, timings=isp_timings.timings, awb_proxy=AWB_PROXY)
 
+writer = FrameWriter(*OUTPUT) if OUTPUT is not None else None
+
+for each in tqdm(range(try_count), total=try_count):
+    pipeline.reset()
+    im_rgb = pipeline.process(raw_image)
+    imshow(im_rgb.astype("u2"), "rgb")
+    if writer is not None:
+        writer(each, np.asarray(im_rgb))
+
+if writer is not None:
+    writer.close()
+print(pipeline.report())
 save_plot(f"timings_{USE_BACKEND}.png")
\ No newline at end of file
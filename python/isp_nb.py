@@ -5,7 +5,7 @@ from isp_types import BayerPattern
 buffers = {}
 
 
-@njit
+@njit(nogil=True)
 def awb(im, bayer_pattern: BayerPattern):
     if bayer_pattern == BayerPattern.GRBG:
         Gr = 0, 0
@@ -27,7 +27,7 @@ def awb(im, bayer_pattern: BayerPattern):
     return g_avg / r_avg, g_avg / b_avg
 
 
-@njit
+@njit(nogil=True)
 def _wb_nb(im, r_gain, b_gain, bayer_pattern: BayerPattern, out):
     if bayer_pattern == BayerPattern.GRBG:
         h, w = im.shape
@@ -41,16 +41,17 @@ def _wb_nb(im, r_gain, b_gain, bayer_pattern: BayerPattern, out):
     return out
 
 
-def wb(im, r_gain, b_gain, bayer_pattern: BayerPattern):
-    global buffers
+def wb(im, r_gain, b_gain, bayer_pattern: BayerPattern, buffers=buffers):
     if "wb" not in buffers:
         buffers["wb"] = im.copy()
 
     out = buffers["wb"]
+    # gains are applied in place, start again from the current frame
+    np.copyto(out, im)
     return _wb_nb(im, r_gain, b_gain, bayer_pattern, out)
 
 
-@njit
+@njit(nogil=True)
 def _demos_nb_grgb(im, bayer_pattern: BayerPattern, out):
 
     # offset of each channel in the bayer pattern
@@ -126,8 +127,7 @@ def _demos_nb_grgb(im, bayer_pattern: BayerPattern, out):
             out[i + 1, j + 1, 2] = (B1 + B3) / 2
 
 
-def demos(im, bayer_pattern: BayerPattern):
-    global buffers
+def demos(im, bayer_pattern: BayerPattern, buffers=buffers):
     if "demos" not in buffers:
         h, w = im.shape
         buffers["demos"] = np.zeros((h, w, 3), dtype=im.dtype)
@@ -142,7 +142,7 @@ def demos(im, bayer_pattern: BayerPattern):
     return out
 
 
-@njit
+@njit(nogil=True)
 def _ccm_nb(im, ccm_mat, out):
     h, w, _ = im.shape
     ccm_t = ccm_mat.T
@@ -163,8 +163,7 @@ def _ccm_nb(im, ccm_mat, out):
                     out[i][j][k] = 1023.0
 
 
-def ccm(im, ccm_mat):
-    global buffers
+def ccm(im, ccm_mat, buffers=buffers):
     if "ccm" not in buffers:
         h, w, _ = im.shape
         buffers["ccm"] = np.zeros((h, w, 3), dtype=im.dtype)
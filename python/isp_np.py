@@ -21,7 +21,7 @@ def awb(im, bayer_pattern: BayerPattern):
     return g_avg / r_avg, g_avg / b_avg
 
 
-def wb(im, r_gain, b_gain, bayer_pattern: BayerPattern):
+def wb(im, r_gain, b_gain, bayer_pattern: BayerPattern, buffers=None):
     out = im.copy().astype("f4")
 
     if bayer_pattern == BayerPattern.GRBG:
@@ -33,7 +33,7 @@ def wb(im, r_gain, b_gain, bayer_pattern: BayerPattern):
     return out
 
 
-def demos(im, bayer_pattern):
+def demos(im, bayer_pattern, buffers=None):
     height, width = im.shape
 
     # Initialize the output color image with 3 channels (R, G, B)
@@ -66,7 +66,7 @@ def demos(im, bayer_pattern):
     return color_image
 
 
-def ccm(im, ccm):
+def ccm(im, ccm, buffers=None):
     h, w, _ = im.shape
     im_ccm = (im.reshape(-1, 3) @ ccm.T) / 1024
     return np.clip(im_ccm.reshape(h, w, 3), 0, 1023).astype(np.uint16)
@@ -0,0 +1,135 @@
+"""
+Headless output of processed frames
+
+Frames are converted to uint8/uint16 in the caller thread, into a buffer taken from a
+fixed pool, and written by a background thread. The pool bounds the memory used by
+pending frames; when it is empty, `submit` blocks until a write is done.
+"""
+import queue
+import threading
+from pathlib import Path
+
+import numpy as np
+
+OUTPUT_FORMATS = ("raw", "npy", "png")
+
+
+def to_bit_depth(rgb, out, in_bits: int = 10, bgr: bool = False, scratch=None):
+    """Convert `rgb` to the bit depth of `out` (uint8 or uint16), in place into `out`
+
+    Values are clipped to `in_bits` first, into `scratch` (same shape and dtype as
+    `rgb`) when given. With `bgr`, channels are swapped as cv2 expects them.
+    """
+    if bgr and rgb.ndim == 3:
+        rgb = rgb[..., ::-1]
+    if scratch is None:
+        scratch = np.empty(rgb.shape, dtype=rgb.dtype)
+    np.clip(rgb, 0, 2 ** in_bits - 1, out=scratch)
+
+    shift = in_bits - out.dtype.itemsize * 8
+    if scratch.dtype.kind == "f":
+        np.multiply(scratch, 2.0 ** -shift, out=out, casting="unsafe")
+    elif shift >= 0:
+        np.right_shift(scratch, shift, out=out, casting="unsafe")
+    else:
+        np.left_shift(scratch, -shift, out=out, casting="unsafe")
+    return out
+
+
+def write_raw(path, im):
+    im.tofile(path)
+
+
+def write_npy(path, im):
+    """Write a .npy file, it can be memory-mapped with np.load(path, mmap_mode="r")"""
+    np.save(path, im)
+
+
+def write_png(path, im, compression: int = 1):
+    """Write a PNG with cv2, `im` must be BGR"""
+    import cv2
+
+    if not cv2.imwrite(str(path), im, [cv2.IMWRITE_PNG_COMPRESSION, compression]):
+        raise OSError(f"Could not write {path}")
+
+
+class _Slot:
+    def __init__(self):
+        self.out = None
+        self.scratch = None
+
+
+class FrameWriter:
+    """Write RGB frames to `out_dir` as raw, npy or png from a background thread
+
+    At most `max_pending` frames are held in memory. The writer can be passed as the
+    `on_frame` callback of `Pipeline.run`.
+    """
+
+    def __init__(self, out_dir, fmt: str = "npy", dtype=np.uint16, in_bits: int = 10, max_pending: int = 4,
+                 png_compression: int = 1):
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format: {fmt}")
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.fmt = fmt
+        self.dtype = np.dtype(dtype)
+        self.in_bits = in_bits
+        self.png_compression = png_compression
+        self.n_written = 0
+        self.error = None
+
+        self.free = queue.Queue()
+        for _ in range(max_pending):
+            self.free.put(_Slot())
+        self.pending = queue.Queue()
+        self.thread = threading.Thread(target=self._work, daemon=True)
+        self.thread.start()
+
+    def submit(self, rgb, name: str):
+        """Convert `rgb` and queue it for writing; `rgb` can be reused once this returns"""
+        if self.error is not None:
+            raise self.error
+
+        slot = self.free.get()
+        if slot.out is None or slot.out.shape != rgb.shape or slot.scratch.dtype != rgb.dtype:
+            slot.out = np.empty(rgb.shape, dtype=self.dtype)
+            slot.scratch = np.empty(rgb.shape, dtype=rgb.dtype)
+        to_bit_depth(rgb, slot.out, self.in_bits, bgr=self.fmt == "png", scratch=slot.scratch)
+        self.pending.put((slot, self.out_dir / f"{name}.{self.fmt}"))
+
+    def __call__(self, index: int, rgb):
+        self.submit(rgb, f"frame_{index:05d}")
+
+    def _work(self):
+        while (item := self.pending.get()) is not None:
+            slot, path = item
+            try:
+                if self.fmt == "raw":
+                    write_raw(path, slot.out)
+                elif self.fmt == "npy":
+                    write_npy(path, slot.out)
+                else:
+                    write_png(path, slot.out, self.png_compression)
+                self.n_written += 1
+            except Exception as e:
+                self.error = e
+            finally:
+                self.free.put(slot)
+
+    def close(self):
+        """Wait for the pending frames to be written"""
+        if self.thread.is_alive():
+            self.pending.put(None)
+            self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+__all__ = ["OUTPUT_FORMATS", "to_bit_depth", "write_raw", "write_npy", "write_png", "FrameWriter"]
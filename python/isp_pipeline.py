@@ -0,0 +1,165 @@
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import isp_types
+from isp_timings import time_this
+from isp_awb import awb_proxy
+from isp_plan import Plan, plan_pipeline, plan_from_config, roi_input_region, BUFFERED_BACKENDS
+
+BACKENDS = {
+    "numpy": "isp_np",
+    "numba": "isp_nb",
+    "fxp": "isp_fxp",
+}
+
+
+class Pipeline:
+    """ISP pipeline for one camera stream
+
+    All the state of a stream (backend, config, intermediate buffers and timings)
+    is held by the instance, so several pipelines can run concurrently from a thread
+    pool. The numba kernels are compiled with `nogil=True`, so with the numba backend
+    the streams actually run in parallel.
+
+    Timings of full frames are recorded in `timings`, those of `process_roi` in
+    `roi_timings`, so ROI latencies do not mix with the full frame statistics.
+
+    `awb_proxy` is an optional (mode, factor) tuple, to estimate the AWB gains on a
+    reduced view of the frame, see `isp_awb.awb_proxy_view`.
+
+    The stages to run and the layout of the intermediate buffers come from `plan`.
+    Without a plan, awb, wb, demos (and ccm if `ccm_mat` is given) are planned for
+    the shape of the first frame.
+    """
+
+    def __init__(self, backend: str, bayer_pattern: isp_types.BayerPattern, ccm_mat=None, timings=None,
+                 awb_proxy=None, plan: Plan | None = None, roi_timings=None):
+        self.backend_name = backend
+        self.backend = importlib.import_module(BACKENDS[backend])
+        self.bayer_pattern = bayer_pattern
+        self.ccm_mat = ccm_mat
+        self.awb_proxy = awb_proxy
+        self.plan = plan
+        self.gains = None
+        self.buffers = {}
+        self.roi_buffers = {}
+        self.timings = {} if timings is None else timings
+        self.roi_timings = {} if roi_timings is None else roi_timings
+
+    @classmethod
+    def from_config(cls, config: dict, backend: str = "numba", timings=None, awb_proxy=None, dtype=np.uint16):
+        """Create a pipeline from an Infinite-ISP config, disabled stages are skipped
+
+        `dtype` is the dtype of the raw frames that will be processed.
+        """
+        bayer_pattern = isp_types.BayerPattern[config["sensor_info"]["bayer_pattern"].upper()]
+        plan = plan_from_config(config, dtype)
+        ccm_mat = None
+        if "ccm" in plan.stages:
+            ccm_mat = np.array([
+                config["color_correction_matrix"]["corrected_red"],
+                config["color_correction_matrix"]["corrected_green"],
+                config["color_correction_matrix"]["corrected_blue"],
+            ]).astype(np.float32)
+        return cls(backend, bayer_pattern, ccm_mat, timings, awb_proxy, plan)
+
+    def reset(self):
+        self.buffers.clear()
+        self.roi_buffers.clear()
+
+    def awb(self, raw):
+        if self.awb_proxy is None:
+            return self.backend.awb(raw, self.bayer_pattern)
+        mode, factor = self.awb_proxy
+        return awb_proxy(self.backend.awb, raw, self.bayer_pattern, factor, mode)
+
+    def process(self, raw):
+        """Run one frame through the pipeline, return the RGB image
+
+        The returned image may be a buffer owned by the pipeline, that is overwritten
+        by the next call.
+        """
+        self._check_plan(raw)
+        if not self.buffers and self.backend_name in BUFFERED_BACKENDS:
+            self.buffers.update(self.plan.allocate())
+
+        with time_this("total", self.timings):
+            return self._run_stages(raw, self.plan.stages, self.plan.gains, self.buffers, self.timings)
+
+    def process_roi(self, raw, roi, gains=None):
+        """Compute the (y0, x0, y1, x1) rectangle of the RGB output of `raw`
+
+        Only the input region needed for `roi` is processed, the result is identical to
+        the same rectangle of `process(raw)`. Global statistics are not computed on the
+        region: the AWB gains are `gains` if given, else the gains of the last frame,
+        else they are computed once on the full frame, as part of the "total" time.
+        """
+        self._check_plan(raw)
+        stages = [stage for stage in self.plan.stages if stage != "awb"]
+        with time_this("total", self.roi_timings):
+            if gains is None:
+                if "awb" not in self.plan.stages:
+                    gains = self.plan.gains
+                else:
+                    if self.gains is None:
+                        self.gains = self.awb(raw)
+                    gains = self.gains
+
+            (ry0, rx0, ry1, rx1), (y0, x0, y1, x1) = roi_input_region(roi, stages, raw.shape)
+            region = raw[ry0:ry1, rx0:rx1]
+            buffers = self.roi_buffers.setdefault(region.shape, {})
+            im = self._run_stages(np.ascontiguousarray(region), stages, gains, buffers, self.roi_timings)
+        return im[y0:y1, x0:x1]
+
+    def _check_plan(self, raw):
+        if self.plan is None:
+            stages = ["awb", "wb", "demos"] + (["ccm"] if self.ccm_mat is not None else [])
+            self.plan = plan_pipeline(stages, raw.shape, raw.dtype)
+        elif raw.shape != self.plan.shape:
+            raise ValueError(f"Frame shape {raw.shape} does not match the plan {self.plan.shape}")
+        elif raw.dtype != self.plan.dtype:
+            raise ValueError(f"Frame dtype {raw.dtype} does not match the plan {self.plan.dtype}")
+
+    def _run_stages(self, raw, stages, gains, buffers, timings):
+        b = self.backend
+        im = raw
+        for stage in stages:
+            with time_this(stage, timings):
+                if stage == "awb":
+                    gains = self.gains = self.awb(raw)
+                elif stage == "wb":
+                    im = b.wb(im, gains[0], gains[1], self.bayer_pattern, buffers=buffers)
+                elif stage == "demos":
+                    im = b.demos(im, self.bayer_pattern, buffers=buffers)
+                elif stage == "ccm":
+                    im = b.ccm(im.astype(np.float32), self.ccm_mat, buffers=buffers)
+        return im
+
+    def report(self) -> str:
+        """Stage order, buffer sizes, peak memory and mean stage timings of the plan"""
+        return self.plan.report(self.timings)
+
+    def run(self, frames, on_frame=None):
+        """Process a sequence of frames, `on_frame(index, rgb)` is called for each output"""
+        for i, raw in enumerate(frames):
+            rgb = self.process(raw)
+            if on_frame is not None:
+                on_frame(i, rgb)
+
+
+def run_streams(pipelines, streams, on_frame=None, max_workers=None):
+    """Run each pipeline on its stream of frames, one thread per stream
+
+    `on_frame(stream_index, frame_index, rgb)` is called from the worker threads.
+    """
+    def work(k):
+        callback = None if on_frame is None else lambda i, rgb: on_frame(k, i, rgb)
+        pipelines[k].run(streams[k], callback)
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(pipelines)) as executor:
+        list(executor.map(work, range(len(pipelines))))
+
+
+__all__ = ["Pipeline", "run_streams", "BACKENDS"]
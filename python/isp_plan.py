@@ -0,0 +1,184 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# stage name -> (Infinite-ISP config section, output channels)
+# stages producing no image (awb) have 0 output channels
+STAGES = {
+    "awb": ("auto_white_balance", 0),
+    "wb": ("white_balance", 1),
+    "demos": ("demosaic", 3),
+    "ccm": ("color_correction_matrix", 3),
+}
+
+# how many input pixels around an output pixel a stage reads, the worst case over
+# the backends (demos interpolates from neighbouring Bayer sites, up to 2px away
+# with the region aligned to the Bayer quad)
+HALOS = {
+    "awb": 0,
+    "wb": 0,
+    "demos": 2,
+    "ccm": 0,
+}
+
+# backends whose stage wrappers write into preallocated `buffers`
+BUFFERED_BACKENDS = ("numba",)
+
+
+@dataclass
+class BufferSpec:
+    name: str
+    shape: tuple
+    dtype: np.dtype
+    producer: int
+    last_use: int
+    arena: int = -1
+
+    @property
+    def nbytes(self) -> int:
+        return int(np.prod(self.shape)) * np.dtype(self.dtype).itemsize
+
+
+@dataclass
+class Plan:
+    """Ordered list of enabled stages, with the memory layout of their outputs
+
+    Intermediate buffers whose lifetimes do not overlap are placed in the same arena.
+    `gains` are the static white balance gains, used when awb is disabled. `shape` and
+    `dtype` are those of the raw frames.
+    """
+    stages: list[str]
+    shape: tuple
+    gains: tuple | None = None
+    dtype: np.dtype = np.dtype(np.uint16)
+    buffers: dict[str, BufferSpec] = field(default_factory=dict)
+    arena_nbytes: list[int] = field(default_factory=list)
+
+    @property
+    def peak_nbytes(self) -> int:
+        return sum(self.arena_nbytes)
+
+    @property
+    def naive_nbytes(self) -> int:
+        return sum(b.nbytes for b in self.buffers.values())
+
+    def allocate(self) -> dict:
+        """Allocate the arenas, return a view of the right shape/dtype for each buffer"""
+        arenas = [np.zeros(n, dtype=np.uint8) for n in self.arena_nbytes]
+        return {
+            name: arenas[b.arena][:b.nbytes].view(b.dtype).reshape(b.shape)
+            for name, b in self.buffers.items()
+        }
+
+    def report(self, timings: dict | None = None) -> str:
+        lines = [f"{'stage':<8}{'buffer':>12}{'arena':>8}{'time (ms)':>12}"]
+        for stage in self.stages:
+            b = self.buffers.get(stage)
+            size = f"{b.nbytes / 2 ** 20:.1f}MiB" if b else "-"
+            arena = str(b.arena) if b else "-"
+            t = "-"
+            if timings and timings.get(stage):
+                t = f"{np.mean(timings[stage][1:] or timings[stage]):.2f}"
+            lines.append(f"{stage:<8}{size:>12}{arena:>8}{t:>12}")
+        lines.append(f"peak memory: {self.peak_nbytes / 2 ** 20:.1f}MiB "
+                     f"(without reuse: {self.naive_nbytes / 2 ** 20:.1f}MiB)")
+        return "\n".join(lines)
+
+
+def stage_enabled(config: dict, stage: str) -> bool:
+    section = config.get(STAGES[stage][0])
+    if section is None:
+        return False
+    return bool(section.get("is_enable", True))
+
+
+def plan_pipeline(stages, shape, dtype=np.uint16, gains=None) -> Plan:
+    """Compute buffer lifetimes for `stages` on frames of `shape`, and assign arenas
+
+    Buffer dtypes follow the numba backend: wb and demos keep the raw dtype,
+    ccm runs on float32.
+    """
+    if "demos" not in stages and "ccm" in stages:
+        raise ValueError("ccm needs an RGB input, demos cannot be disabled")
+    if "wb" in stages and "awb" not in stages and gains is None:
+        raise ValueError("wb without awb needs static gains")
+
+    h, w = shape
+    plan = Plan(list(stages), shape, gains, np.dtype(dtype))
+
+    # liveness: a buffer lives from its producer until its last consumer; the
+    # output of the last stage lives until the end of the frame
+    last = None
+    for step, stage in enumerate(stages):
+        channels = STAGES[stage][1]
+        if channels == 0:
+            continue
+        if last is not None:
+            plan.buffers[last].last_use = step
+        out_shape = (h, w) if channels == 1 else (h, w, channels)
+        out_dtype = np.dtype(np.float32) if stage == "ccm" else np.dtype(dtype)
+        plan.buffers[stage] = BufferSpec(stage, out_shape, out_dtype, step, len(stages))
+        last = stage
+
+    # greedy assignment, in order of definition: reuse the smallest free arena that
+    # is large enough, otherwise grow the largest free one, otherwise add an arena
+    owners = []
+    for b in plan.buffers.values():
+        free = [k for k, owner in enumerate(owners) if owner.last_use < b.producer]
+        fits = [k for k in free if plan.arena_nbytes[k] >= b.nbytes]
+        if fits:
+            k = min(fits, key=lambda k: plan.arena_nbytes[k])
+        elif free:
+            k = max(free, key=lambda k: plan.arena_nbytes[k])
+            plan.arena_nbytes[k] = b.nbytes
+        else:
+            k = len(owners)
+            owners.append(b)
+            plan.arena_nbytes.append(b.nbytes)
+        owners[k] = b
+        b.arena = k
+
+    return plan
+
+
+def roi_input_region(roi, stages, shape):
+    """Map an output rectangle (y0, x0, y1, x1) to the input region needed to compute it
+
+    The region is padded by the halos of `stages`, aligned to the Bayer quad and
+    clipped to the frame. Returns the region and the position of `roi` inside it,
+    both as (y0, x0, y1, x1).
+    """
+    y0, x0, y1, x1 = roi
+    h, w = shape
+    if not (0 <= y0 < y1 <= h and 0 <= x0 < x1 <= w):
+        raise ValueError(f"ROI {roi} is outside of the {shape} frame")
+
+    halo = sum(HALOS[stage] for stage in stages)
+    ry0 = max(0, (y0 - halo) // 2 * 2)
+    rx0 = max(0, (x0 - halo) // 2 * 2)
+    ry1 = min(h, -(-(y1 + halo) // 2) * 2)
+    rx1 = min(w, -(-(x1 + halo) // 2) * 2)
+    return (ry0, rx0, ry1, rx1), (y0 - ry0, x0 - rx0, y1 - ry0, x1 - rx0)
+
+
+def plan_from_config(config: dict, dtype=np.uint16) -> Plan:
+    """Build the plan of an Infinite-ISP config, skipping disabled stages"""
+    shape = config["sensor_info"]["height"], config["sensor_info"]["width"]
+
+    stages = [stage for stage in STAGES if stage_enabled(config, stage)]
+    gains = None
+    if "wb" in stages:
+        wb_config = config["white_balance"]
+        if not wb_config.get("is_auto", True) and "awb" in stages:
+            stages.remove("awb")
+        if "awb" not in stages:
+            gains = wb_config["r_gain"], wb_config["b_gain"]
+    elif "awb" in stages:
+        # gains are only consumed by wb
+        stages.remove("awb")
+
+    return plan_pipeline(stages, shape, dtype, gains)
+
+
+__all__ = ["STAGES", "HALOS", "BufferSpec", "Plan", "plan_pipeline", "plan_from_config", "stage_enabled",
+           "roi_input_region"]
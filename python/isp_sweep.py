@@ -0,0 +1,214 @@
+"""
+Bit-width exploration for the fixed-point pipeline
+
+Each stage is run on the fast fixed-point path (FxpliteArray) for a grid of
+(n_int, n_frac) formats, and compared to the float reference of isp_np. The
+input of each stage is the float reference output of the previous stage, so
+the error of a stage is measured in isolation.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+
+import numpy as np
+
+import isp_np
+from fxplite import FxpliteArray, from_numpy, to_numpy
+from isp_types import BayerPattern
+
+SWEEP_STAGES = ("awb", "wb", "demos", "ccm")
+# signed (n_int, n_frac) of the colour correction coefficients, the config stores them
+# scaled by 1024 so 10 fractional bits are exact
+CCM_COEF_FORMAT = (2, 10)
+
+
+def _quantize(x, n_int, n_frac, signed=False) -> FxpliteArray:
+    return from_numpy(x, n_int, n_frac, signed, overflow="saturate")
+
+
+def awb_fxp(raw, bayer_pattern: BayerPattern, n_int, n_frac):
+    """Channel sums are exact, the gains are divided and stored in the format"""
+    if bayer_pattern != BayerPattern.GRBG:
+        raise NotImplementedError()
+    px = raw.astype(np.int64)
+    # the means of isp_np, with a common denominator
+    r_sum = px[0::2, 1::2].sum() * 2
+    g_sum = px[0::2, 0::2].sum() + px[1::2, 1::2].sum()
+    b_sum = px[1::2, 0::2].sum() * 2
+    g = FxpliteArray(np.array([g_sum, g_sum]), n_int, 0, False, 1).u(n_int, n_frac)
+    rb = FxpliteArray(np.array([r_sum, b_sum]), n_int, 0, False, 1)
+    gains = g / rb
+    gains.overflow_mode = "saturate"
+    return to_numpy(gains.resolve_overflow())
+
+
+def wb_fxp(raw, r_gain, b_gain, bayer_pattern: BayerPattern, n_int, n_frac):
+    if bayer_pattern != BayerPattern.GRBG:
+        raise NotImplementedError()
+    out = _quantize(raw, n_int, n_frac)
+    gains = _quantize(np.array([r_gain, b_gain]), n_int, n_frac).stored_int
+    px = out.stored_int
+    px[0::2, 1::2] = (px[0::2, 1::2] * gains[0]) >> n_frac
+    px[1::2, 0::2] = (px[1::2, 0::2] * gains[1]) >> n_frac
+    return to_numpy(out.resolve_overflow(), np.float32)
+
+
+def demos_float(im, bayer_pattern: BayerPattern):
+    """isp_np.demos without flooring the interpolated values, the reference of demos_fxp"""
+    if bayer_pattern != BayerPattern.GRBG:
+        raise NotImplementedError()
+    height, width = im.shape
+    im = im.astype(np.float64)
+    color_image = np.zeros((height, width, 3), dtype=np.float64)
+    G1 = im[0:height:2, 0:width:2]
+    R = im[0:height:2, 1:width:2]
+    B = im[1:height:2, 0:width:2]
+    G2 = im[1:height:2, 1:width:2]
+
+    color_image[0:height:2, 0:width:2, 0] = R
+    color_image[0:height:2, 1:width - 1:2, 0] = (R[:, :-1] + R[:, 1:]) / 2
+    color_image[1:height - 1:2, 0:width:2, 0] = (R[:-1, :] + R[1:, :]) / 2
+    color_image[1:height - 1:2, 1:width - 1:2, 0] = (R[:-1, :-1] + R[:-1, 1:] + R[1:, :-1] + R[1:, 1:]) / 4
+
+    color_image[0:height:2, 0:width:2, 1] = G1
+    color_image[0:height:2, 1:width:2, 1] = G1
+    color_image[1:height:2, 0:width:2, 1] = G2
+    color_image[1:height:2, 1:width:2, 1] = G2
+
+    color_image[1:height:2, 1:width:2, 2] = B
+    color_image[0:height:2, 1:width - 1:2, 2] = (B[:, :-1] + B[:, 1:]) / 2
+    color_image[1:height - 1:2, 0:width:2, 2] = (B[:-1, :] + B[1:, :]) / 2
+    color_image[0:height - 2:2, 0:width - 2:2, 2] = (B[:-1, :-1] + B[:-1, 1:] + B[1:, :-1] + B[1:, 1:]) / 4
+
+    return color_image
+
+
+def demos_fxp(im, bayer_pattern: BayerPattern, n_int, n_frac):
+    # the numpy demosaic only uses sums and floor divisions, it runs as-is on stored ints
+    x = _quantize(im, n_int, n_frac)
+    out = FxpliteArray(isp_np.demos(x.stored_int, bayer_pattern), n_int, n_frac, False, x.fract_mul, "saturate")
+    return to_numpy(out.resolve_overflow(), np.float32)
+
+
+def ccm_fxp(im, ccm_mat, n_int, n_frac, coef_format=CCM_COEF_FORMAT):
+    """Pixels in the (n_int, n_frac) format, coefficients in their own `coef_format`"""
+    x = _quantize(im, n_int, n_frac, signed=True).stored_int
+    m = _quantize(ccm_mat / 1024, *coef_format, signed=True).stored_int
+    # products have n_frac + coef n_frac fractional bits
+    acc = np.einsum("hwk,jk->hwj", x, m) >> coef_format[1]
+    out = FxpliteArray(acc, n_int, n_frac, True, 2 ** n_frac, "saturate").resolve_overflow()
+    return np.clip(to_numpy(out), 0, 1023).astype(np.uint16)
+
+
+def reference_chain(raw, bayer_pattern: BayerPattern, ccm_mat):
+    """Float outputs of each stage of isp_np, and the input each stage is fed with
+
+    The demos reference is not floored, so it measures the precision of the format.
+    ccm is fed with the isp_np demosaic, as in the pipeline.
+    """
+    gains = isp_np.awb(raw, bayer_pattern)
+    im_wb = isp_np.wb(raw, *gains, bayer_pattern)
+    im_demos = isp_np.demos(im_wb, bayer_pattern).astype(np.float32)
+    im_ccm = isp_np.ccm(im_demos, ccm_mat)
+    return {
+        "awb": (raw, np.array(gains)),
+        "wb": ((raw, gains), im_wb),
+        "demos": (im_wb, demos_float(im_wb, bayer_pattern)),
+        "ccm": (im_demos, im_ccm),
+    }
+
+
+def error_metrics(out, ref, peak):
+    err = np.asarray(out, dtype=np.float64) - np.asarray(ref, dtype=np.float64)
+    mse = np.mean(err ** 2)
+    psnr = np.inf if mse == 0 else 10 * np.log10(peak ** 2 / mse)
+    return psnr, float(np.max(np.abs(err)))
+
+
+def run_stage(stage, ref, bayer_pattern: BayerPattern, ccm_mat, n_int, n_frac, bit_depth=10):
+    """Run one stage in the (n_int, n_frac) format, return its error against the reference"""
+    stage_in, stage_ref = ref[stage]
+    signed = stage == "ccm"
+    if stage == "awb":
+        out = awb_fxp(stage_in, bayer_pattern, n_int, n_frac)
+        peak = np.max(stage_ref)
+    elif stage == "wb":
+        raw, gains = stage_in
+        out = wb_fxp(raw, *gains, bayer_pattern, n_int, n_frac)
+        peak = 2 ** bit_depth - 1
+    elif stage == "demos":
+        out = demos_fxp(stage_in, bayer_pattern, n_int, n_frac)
+        peak = 2 ** bit_depth - 1
+    elif stage == "ccm":
+        out = ccm_fxp(stage_in, ccm_mat, n_int, n_frac)
+        peak = 2 ** bit_depth - 1
+    else:
+        raise ValueError(f"Unknown stage: {stage}")
+
+    psnr, max_err = error_metrics(out, stage_ref, peak)
+    return {
+        "stage": stage,
+        "n_int": n_int,
+        "n_frac": n_frac,
+        "bits": n_int + n_frac + int(signed),
+        "psnr": psnr,
+        "max_err": max_err,
+    }
+
+
+def sweep(raw, bayer_pattern: BayerPattern, ccm_mat, n_ints=range(8, 17, 2), n_fracs=range(0, 13, 2),
+          stages=SWEEP_STAGES, max_workers=None):
+    """Run every stage for every (n_int, n_frac) format of the grid, in parallel"""
+    ref = reference_chain(raw, bayer_pattern, ccm_mat)
+    tasks = list(product(stages, n_ints, n_fracs))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda t: run_stage(t[0], ref, bayer_pattern, ccm_mat, t[1], t[2]), tasks))
+
+
+def pareto_front(rows, error: str = "max_err"):
+    """Formats of each stage for which no narrower or equal format has a lower or equal error"""
+    if error == "psnr":
+        value = lambda row: -row["psnr"]
+    else:
+        value = lambda row: row[error]
+
+    front = {}
+    for stage in dict.fromkeys(row["stage"] for row in rows):
+        best = np.inf
+        front[stage] = []
+        for row in sorted((row for row in rows if row["stage"] == stage), key=lambda row: (row["bits"], value(row))):
+            if value(row) < best:
+                best = value(row)
+                front[stage].append(row)
+    return front
+
+
+def format_front(front) -> str:
+    lines = []
+    for stage, rows in front.items():
+        lines.append(f"{stage}:")
+        lines.append(f"  {'bits':>5}{'n_int':>7}{'n_frac':>7}{'psnr (dB)':>11}{'max err':>10}")
+        for row in rows:
+            lines.append(f"  {row['bits']:>5}{row['n_int']:>7}{row['n_frac']:>7}"
+                         f"{row['psnr']:>11.2f}{row['max_err']:>10.3f}")
+    return "\n".join(lines)
+
+
+def main():
+    import isp_datasets
+
+    data = isp_datasets.infinite_isp()["Indoor1_2592x1536_10bit_GRBG"]
+    raw_image, config = data["raw"], data["config_data"]
+    h, w = config["sensor_info"]["height"], config["sensor_info"]["width"]
+    bayer_pattern = BayerPattern[config["sensor_info"]["bayer_pattern"].upper()]
+    ccm_mat = np.array([
+        config["color_correction_matrix"]["corrected_red"],
+        config["color_correction_matrix"]["corrected_green"],
+        config["color_correction_matrix"]["corrected_blue"],
+    ]).astype(np.float32)
+
+    rows = sweep(raw_image.reshape(h, w), bayer_pattern, ccm_mat, n_ints=range(2, 17), n_fracs=range(0, 13))
+    print(format_front(pareto_front(rows)))
+
+
+if __name__ == '__main__':
+    main()
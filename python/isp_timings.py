@@ -6,8 +6,7 @@ timings = {}
 
 
 @contextlib.contextmanager
-def time_this(name: str):
-    global timings
+def time_this(name: str, timings: dict = timings):
     t0 = time.perf_counter_ns()
     if name not in timings:
         timings[name] = []
@@ -20,6 +19,8 @@ def time_this(name: str):
 
 @atexit.register
 def print_timings():
+    if not timings:
+        return
     from pandas import DataFrame
 
     df = DataFrame(timings)
@@ -0,0 +1,169 @@
+import importlib
+
+import numpy as np
+import pytest
+
+from isp_awb import awb_proxy_view, awb_proxy, awb_proxy_report, PROXY_MODES, TemporalAWB
+from isp_types import BayerPattern
+
+
+@pytest.fixture
+def grgb_image():
+    rng = np.random.default_rng(0)
+    h, w = 256, 384
+    im = rng.integers(0, 1024, size=(h, w)).astype(np.uint16)
+    # a colour cast, so gains are not all ~1
+    im[0::2, 1::2] //= 2  # R
+    im[1::2, 0::2] //= 3  # B
+    yield im
+
+
+class TestAWBProxySpec:
+    @staticmethod
+    @pytest.mark.parametrize("mode", PROXY_MODES)
+    def test_view_keeps_bayer_phase(grgb_image, mode):
+        view = awb_proxy_view(grgb_image, 4, mode)
+        assert view.shape[0] % 2 == 0 and view.shape[1] % 2 == 0
+        # R sites stay dimmer than G sites, B sites dimmest
+        assert view[0::2, 1::2].mean() < view[0::2, 0::2].mean()
+        assert view[1::2, 0::2].mean() < view[0::2, 1::2].mean()
+
+    @staticmethod
+    @pytest.mark.parametrize("mode", PROXY_MODES)
+    def test_odd_frame_size(grgb_image, mode):
+        from isp_np import awb
+        im = grgb_image[:63, :95]
+        view = awb_proxy_view(im, 2, mode)
+        assert view.shape[0] % 2 == 0 and view.shape[1] % 2 == 0
+        np.testing.assert_allclose(awb_proxy(awb, im, BayerPattern.GRBG, 2, mode), awb(im, BayerPattern.GRBG),
+                                   rtol=0.1)
+
+    @staticmethod
+    def test_stride_selects_quads(grgb_image):
+        view = awb_proxy_view(grgb_image, 2, "stride")
+        np.testing.assert_equal(view[0:2, 0:2], grgb_image[0:2, 0:2])
+        np.testing.assert_equal(view[0:2, 2:4], grgb_image[0:2, 4:6])
+        np.testing.assert_equal(view[2:4, 0:2], grgb_image[4:6, 0:2])
+
+    @staticmethod
+    def test_numpy_and_numba_proxy_gains_are_equivalent(grgb_image):
+        from isp_np import awb as awb_np
+        from isp_nb import awb as awb_nb
+        gains_np = awb_proxy(awb_np, grgb_image, BayerPattern.GRBG, 4, "stride")
+        gains_nb = awb_proxy(awb_nb, grgb_image, BayerPattern.GRBG, 4, "stride")
+        np.testing.assert_allclose(gains_np, gains_nb, rtol=1e-9)
+
+    @staticmethod
+    def test_report(grgb_image):
+        from isp_np import awb
+        report = awb_proxy_report(awb, grgb_image, BayerPattern.GRBG, factors=(2, 4))
+        assert len(report) == 2 * len(PROXY_MODES)
+        for row in report:
+            assert row["r_err"] < 0.05 and row["b_err"] < 0.05
+            assert row["time_ms"] > 0 and row["speedup"] > 0
+
+
+class TestTemporalAWBSpec:
+    @staticmethod
+    def test_first_frame_matches_awb(grgb_image):
+        from isp_np import awb
+        estimator = TemporalAWB(awb, BayerPattern.GRBG)
+        assert estimator(grgb_image) == awb(grgb_image, BayerPattern.GRBG)
+        assert estimator.n_full == 1
+
+    @staticmethod
+    def test_static_scene_skips_statistics(grgb_image):
+        from isp_np import awb
+        estimator = TemporalAWB(awb, BayerPattern.GRBG)
+        gains = estimator(grgb_image)
+        for _ in range(5):
+            assert estimator(grgb_image) == gains
+        assert estimator.n_full == 1
+        assert estimator.n_skipped == 5
+
+    @staticmethod
+    def test_scene_change_takes_new_gains(grgb_image):
+        from isp_np import awb
+        estimator = TemporalAWB(awb, BayerPattern.GRBG, alpha=0.5, max_age=None)
+        estimator(grgb_image)
+
+        other = grgb_image.copy()
+        other[0::2, 1::2] //= 2
+        gains = awb(other, BayerPattern.GRBG)
+
+        assert estimator(other) == gains
+        assert estimator.last_change > estimator.threshold
+        assert estimator.n_full == 2
+        for _ in range(10):
+            assert estimator(other) == gains
+        assert estimator.n_full == 2
+
+    @staticmethod
+    def test_refresh_smooths_gains(grgb_image):
+        from isp_np import awb
+        estimator = TemporalAWB(awb, BayerPattern.GRBG, alpha=0.5, threshold=0.5, max_age=1)
+        r0, b0 = estimator(grgb_image)
+
+        # a small change, under the threshold: the forced refresh is smoothed
+        other = grgb_image.copy()
+        other[0::2, 1::2] = other[0::2, 1::2] * 9 // 10
+        r1, b1 = awb(other, BayerPattern.GRBG)
+
+        estimator(other)
+        assert estimator.last_change <= estimator.threshold
+        r, b = estimator(other)
+        assert estimator.n_full == 2
+        np.testing.assert_allclose((r, b), ((r0 + r1) / 2, (b0 + b1) / 2))
+
+        for _ in range(100):
+            r, b = estimator(other)
+        np.testing.assert_allclose((r, b), (r1, b1))
+
+    @staticmethod
+    def test_defaults_smooth_slow_changes(grgb_image):
+        from isp_np import awb
+        estimator = TemporalAWB(awb, BayerPattern.GRBG)
+        r0, _ = estimator(grgb_image)
+
+        # a slow drift, under the scene change threshold
+        other = grgb_image.copy()
+        other[0::2, 1::2] = other[0::2, 1::2] * 39 // 40
+        r1, b1 = awb(other, BayerPattern.GRBG)
+
+        gains = [estimator(other) for _ in range(100)]
+        assert estimator.last_change <= estimator.threshold
+        # the first refresh moves part of the way, then the gains converge
+        r_first = next(g[0] for g in gains if g[0] != r0)
+        assert r0 < r_first < r1
+        np.testing.assert_allclose(gains[-1], (r1, b1), rtol=1e-4)
+
+    @staticmethod
+    def test_max_age_forces_refresh(grgb_image):
+        from isp_np import awb
+        estimator = TemporalAWB(awb, BayerPattern.GRBG, max_age=2)
+        for _ in range(6):
+            estimator(grgb_image)
+        assert estimator.n_full == 2
+
+
+@pytest.mark.benchmark(group="awb-proxy")
+class TestBenchmarkAWBProxy:
+    """Cost of each proxy mode against the full resolution pass, on a full sensor frame"""
+
+    @staticmethod
+    @pytest.mark.parametrize("backend", ["isp_np", "isp_nb"])
+    def test_benchmark_full_resolution(benchmark, backend):
+        awb = importlib.import_module(backend).awb
+        im = np.random.default_rng(0).integers(0, 1024, size=(1536, 2592)).astype(np.uint16)
+        awb(im, BayerPattern.GRBG)
+        benchmark(lambda: awb(im, BayerPattern.GRBG))
+
+    @staticmethod
+    @pytest.mark.parametrize("backend", ["isp_np", "isp_nb"])
+    @pytest.mark.parametrize("mode", PROXY_MODES)
+    @pytest.mark.parametrize("factor", [2, 4, 8])
+    def test_benchmark_proxy(benchmark, backend, mode, factor):
+        awb = importlib.import_module(backend).awb
+        im = np.random.default_rng(0).integers(0, 1024, size=(1536, 2592)).astype(np.uint16)
+        awb_proxy(awb, im, BayerPattern.GRBG, factor, mode)
+        benchmark(lambda: awb_proxy(awb, im, BayerPattern.GRBG, factor, mode))
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+import fxp_kernels
+from fxplite import FxpliteArray
+from isp_bench import make_inputs, binning_2x2_np, binning_2x2_nb, binning_2x2_fxplite, run, comparison
+
+
+@pytest.fixture
+def im_u8():
+    # full range, integer sums wrap in the storage type
+    yield np.random.default_rng(0).integers(0, 256, size=(64, 96)).astype(np.uint8)
+
+
+@pytest.fixture
+def lib():
+    try:
+        yield fxp_kernels.load_library()
+    except OSError as e:
+        pytest.skip(str(e))
+
+
+class TestBinningSpec:
+    @staticmethod
+    @pytest.mark.parametrize("fmt", list(fxp_kernels.FORMATS))
+    def test_numpy_and_numba_are_equivalent(im_u8, fmt):
+        im = make_inputs(im_u8)[fmt]
+        out_np = binning_2x2_np(im, np.empty((32, 48), dtype=im.dtype))
+        out_nb = binning_2x2_nb(im, np.empty((32, 48), dtype=im.dtype))
+        np.testing.assert_allclose(out_np, out_nb, rtol=1e-6)
+
+    @staticmethod
+    def test_integer_sums_wrap(im_u8):
+        im = make_inputs(im_u8)["u8"]
+        wrapped = im[0::2, 0::2].astype(np.int64) + im[0::2, 1::2] + im[1::2, 0::2] + im[1::2, 1::2] > 255
+        assert wrapped.any()
+        expected = ((im[0::2, 0::2].astype(np.int64) + im[0::2, 1::2] + im[1::2, 0::2] + im[1::2, 1::2]) % 256) // 4
+        np.testing.assert_equal(binning_2x2_nb(im, np.empty((32, 48), dtype=im.dtype)), expected)
+
+    @staticmethod
+    @pytest.mark.parametrize("fmt, n_int, n_frac", [("q8_4", 4, 4), ("q16_4", 10, 6)])
+    def test_fxplite_matches_numpy(im_u8, fmt, n_int, n_frac):
+        raw = make_inputs(im_u8)[fmt]
+        out = binning_2x2_fxplite(FxpliteArray(raw.astype(np.int64), n_int, n_frac, False, 2 ** n_frac))
+        np.testing.assert_equal(out.stored_int, binning_2x2_np(raw, np.empty((32, 48), dtype=raw.dtype)))
+
+    @staticmethod
+    def test_bench_compares_engines_on_fixed_point_formats(im_u8):
+        timings = {}
+        run(im_u8, try_count=2, with_cpp=False, timings=timings)
+        for fmt in ("q8_4", "q16_4"):
+            assert {f"numpy_{fmt}", f"numba_{fmt}", f"fxplite_{fmt}"} <= timings.keys()
+        assert "q16_4" in comparison(timings)
+
+    @staticmethod
+    @pytest.mark.parametrize("fmt", list(fxp_kernels.FORMATS))
+    def test_cpp_matches_numpy(lib, im_u8, fmt):
+        im = make_inputs(im_u8)[fmt]
+        expected = binning_2x2_np(im, np.empty((32, 48), dtype=im.dtype))
+        np.testing.assert_allclose(fxp_kernels.binning_2x2(im, fmt), expected, rtol=1e-6)
+
+    @staticmethod
+    def test_cpp_writes_into_strided_views(lib, im_u8):
+        im = make_inputs(im_u8)["f32"]
+        out = np.zeros((32, 64), dtype=np.float32)
+        fxp_kernels.binning_2x2(im[:, :64], "f32", out[:, :32])
+        expected = binning_2x2_np(im[:, :64], np.empty((32, 32), dtype=np.float32))
+        np.testing.assert_allclose(out[:, :32], expected, rtol=1e-6)
+        assert not out[:, 32:].any()
+
+    @staticmethod
+    def test_cpp_rejects_unsafe_buffers(im_u8):
+        with pytest.raises(ValueError):
+            fxp_kernels.binning_2x2(im_u8[::-1], "u8")
+        with pytest.raises(ValueError):
+            fxp_kernels.binning_2x2(im_u8, "u8", np.empty((32, 48), dtype=np.uint8)[::-1])
+        with pytest.raises(ValueError):
+            fxp_kernels.binning_2x2(im_u8[None], "u8")
+        out = np.empty((32, 48), dtype=np.uint8)
+        out.flags.writeable = False
+        with pytest.raises(ValueError):
+            fxp_kernels.binning_2x2(im_u8, "u8", out)
+
+    @staticmethod
+    def test_cpp_checks_dtype(lib, im_u8):
+        with pytest.raises(TypeError):
+            fxp_kernels.binning_2x2(im_u8, "q16_4")
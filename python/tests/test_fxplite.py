@@ -1,7 +1,10 @@
+import math
+
 import numpy as np
 import pytest
 
-from fxplite import Fxplite, make_fxp, U
+from fxplite import Fxplite, make_fxp, U, FxpliteArray, from_numpy, to_numpy, from_fxpmath, to_fxpmath, fxplite_range, \
+    fxplite_sqrt
 from fxpmath import Fxp
 
 
@@ -43,6 +46,186 @@ class TestFXPLiteSpec:
         assert a.stored_int == 0b111_11
 
 
+class TestFXPLiteArraySpec:
+
+    @staticmethod
+    def test_from_numpy_matches_make_fxp():
+        values = np.array([0, 1, 2.5, 3.2, 5.4, 7.9])
+        a = from_numpy(values, 3, 2)
+        assert [a[i] for i in range(len(a))] == [make_fxp(v, 3, 2) for v in values]
+
+    @staticmethod
+    @pytest.mark.parametrize("rounding, expected", [
+        ("trunc", [0b101_01, -0b101_01]),
+        ("floor", [0b101_01, -0b101_10]),
+        ("round", [0b101_10, -0b101_10]),
+    ])
+    def test_from_numpy_rounding(rounding, expected):
+        a = from_numpy(np.array([5.4, -5.4]), 3, 2, signed=True, rounding=rounding)
+        np.testing.assert_equal(a.stored_int, expected)
+
+    @staticmethod
+    @pytest.mark.parametrize("rounding", ["trunc", "floor", "round"])
+    @pytest.mark.parametrize("value", [3.3, np.float32(3.3), np.array(3.3)])
+    def test_from_numpy_scalar(value, rounding):
+        a = from_numpy(value, 4, 4, rounding=rounding)
+        assert a.shape == ()
+        assert int(a.stored_int) == (53 if rounding == "round" else 52)
+
+    @staticmethod
+    def test_from_numpy_integers_are_exact():
+        a = from_numpy(np.arange(1024, dtype=np.uint16), 10, 6)
+        np.testing.assert_equal(to_numpy(a), np.arange(1024))
+        np.testing.assert_equal(to_numpy(a, dtype=np.uint16), np.arange(1024))
+
+    @staticmethod
+    def test_arithmetic_matches_scalar():
+        a = from_numpy(np.array([1.25, 2.5]), 4, 4)
+        b = from_numpy(np.array([1.5, 0.75]), 4, 4)
+        assert (a + b)[1] == make_fxp(2.5, 4, 4) + make_fxp(0.75, 4, 4)
+        assert (a * b)[0] == make_fxp(1.25, 4, 4) * make_fxp(1.5, 4, 4)
+        np.testing.assert_equal((a - b).val(), [-0.25, 1.75])
+
+    @staticmethod
+    def test_fxpmath_roundtrip():
+        values = np.array([1.5, -2.25, 3.0625])
+        fxp = Fxp(values, signed=True, n_word=16, n_frac=4)
+        a = from_fxpmath(fxp)
+        assert (a.n_int, a.n_frac, a.signed) == (fxp.n_int, fxp.n_frac, True)
+        np.testing.assert_equal(to_numpy(a), fxp.get_val())
+
+        back = to_fxpmath(a)
+        assert back.n_word == 16 and back.n_frac == 4
+        np.testing.assert_equal(back.get_val(), fxp.get_val())
+
+    @staticmethod
+    def test_from_fxpmath_change_format():
+        fxp = Fxp(np.array([1.5, 2.75]), signed=False, n_word=16, n_frac=4)
+        a = from_fxpmath(fxp, n_frac=1, rounding="round")
+        np.testing.assert_equal(to_numpy(a), [1.5, 3.0])
+
+
+class TestFXPLiteOverflowSpec:
+
+    @staticmethod
+    def test_scalar_overflow():
+        assert fxplite_range(3, 2, False) == (0, 0b11111)
+        assert fxplite_range(3, 2, True) == (-0b100000, 0b11111)
+        assert not make_fxp(7.75, 3, 2).overflow()
+        assert make_fxp(8, 3, 2).overflow()
+
+    @staticmethod
+    def test_off_does_nothing():
+        a = from_numpy(np.array([8.0, 100.0]), 3, 2)
+        np.testing.assert_equal(a.val(), [8.0, 100.0])
+        assert a.n_overflow == 0
+
+    @staticmethod
+    def test_count():
+        a = from_numpy(np.array([1.0, 8.0, 100.0]), 3, 2, overflow="count")
+        np.testing.assert_equal(a.val(), [1.0, 8.0, 100.0])
+        assert a.n_overflow == 2
+        np.testing.assert_equal(a.overflow(), [False, True, True])
+
+    @staticmethod
+    def test_saturate():
+        a = from_numpy(np.array([-9.0, 1.0, 9.0]), 3, 2, signed=True, overflow="saturate")
+        np.testing.assert_equal(a.val(), [-8.0, 1.0, 7.75])
+        assert a.n_overflow == 2
+
+    @staticmethod
+    @pytest.mark.parametrize("signed, values, expected", [
+        (False, [9.0, 17.5], [1.0, 1.5]),
+        (True, [9.0, -9.0, -17.5], [-7.0, 7.0, -1.5]),
+    ])
+    def test_wrap(signed, values, expected):
+        a = from_numpy(np.array(values), 3, 2, signed=signed, overflow="wrap")
+        np.testing.assert_equal(a.val(), expected)
+        assert a.n_overflow == len(values)
+
+    @staticmethod
+    def test_counters_accumulate_across_operations():
+        a = from_numpy(np.array([6.0, 1.0]), 3, 2, overflow="saturate")
+        c = (a + a).resolve_overflow()
+        np.testing.assert_equal(c.val(), [7.75, 2.0])
+        assert c.n_overflow == 1
+        c += a
+        assert c.resolve_overflow().n_overflow == 2
+
+
+class TestFXPLiteDivSpec:
+
+    @staticmethod
+    def test_div_does_not_mutate():
+        a = make_fxp(3, 4, 4)
+        b = make_fxp(1.5, 4, 4)
+        assert a / b == make_fxp(2, 4, 4)
+        assert a == make_fxp(3, 4, 4)
+        a /= b
+        assert a == make_fxp(2, 4, 4)
+
+    @staticmethod
+    @pytest.mark.parametrize("x, y", [(7.5, 2), (-7.5, 2), (7.5, -2), (-7.5, -2), (6, 1.5), (0.25, 3)])
+    def test_divmod_matches_python(x, y):
+        a = make_fxp(x, 8, 4, True)
+        b = make_fxp(y, 8, 4, True)
+        q, r = divmod(a, b)
+        assert (q.stored_int, r.stored_int) == tuple(int(v * 16) for v in divmod(x, y))
+
+    @staticmethod
+    @pytest.mark.parametrize("n_int, n_frac", [(4, 4), (8, 8), (10, 6), (16, 16), (24, 8)])
+    def test_scalar_matches_exact_integer_arithmetic(n_int, n_frac):
+        rng = np.random.default_rng(n_int + n_frac)
+        for x, y in rng.integers(1, 2 ** (n_int + n_frac), size=(200, 2)).tolist():
+            a = Fxplite(x, n_int, n_frac, True, 2 ** n_frac)
+            b = Fxplite(y, n_int, n_frac, True, 2 ** n_frac)
+            assert (a / b).stored_int == (x << n_frac) // y
+            neg_a = Fxplite(-x, n_int, n_frac, True, 2 ** n_frac)
+            assert (neg_a / b).stored_int == -((x << n_frac) // y)
+            assert a.reciprocal().stored_int == (1 << 2 * n_frac) // x
+            assert a.sqrt().stored_int == math.isqrt(x << n_frac)
+
+    @staticmethod
+    @pytest.mark.parametrize("n_int, n_frac", [(4, 4), (8, 8), (10, 6), (16, 16), (24, 8), (24, 24), (8, 40)])
+    def test_array_matches_scalar(n_int, n_frac):
+        rng = np.random.default_rng(n_int + n_frac)
+        x = rng.integers(1, 2 ** (n_int + n_frac), size=500)
+        y = rng.integers(1, 2 ** (n_int + n_frac), size=500)
+        y[::2] *= -1
+        a = FxpliteArray(x, n_int, n_frac, True, 2 ** n_frac)
+        b = FxpliteArray(y, n_int, n_frac, True, 2 ** n_frac)
+
+        quotient, reciprocal, root = a / b, b.reciprocal(), a.sqrt()
+        for i in range(len(a)):
+            assert quotient[i] == a[i] / b[i]
+            assert reciprocal[i] == b[i].reciprocal()
+            assert root[i] == a[i].sqrt()
+
+    @staticmethod
+    @pytest.mark.parametrize("iterations", [0, 1, 3])
+    def test_sqrt_correction_without_iterations(iterations):
+        x = Fxplite(2 ** 44 - 1, 24, 20, False, 2 ** 20)
+        assert fxplite_sqrt(x, iterations).stored_int == math.isqrt(x.stored_int << 20)
+        a = FxpliteArray(np.arange(1, 2 ** 16, 7) << 20, 12, 20, False, 2 ** 20)
+        np.testing.assert_equal(a.sqrt(iterations).stored_int, [math.isqrt(int(v) << 20) for v in a.stored_int])
+
+    @staticmethod
+    def test_division_by_zero():
+        with pytest.raises(ZeroDivisionError):
+            make_fxp(1, 4, 4) / make_fxp(0, 4, 4)
+        with pytest.raises(ZeroDivisionError):
+            from_numpy(np.array([1, 0]), 4, 4).reciprocal()
+
+    @staticmethod
+    def test_awb_gains():
+        from isp_fxp import awb as awb_fxp
+        from isp_np import awb as awb_np
+        from isp_types import BayerPattern
+        im = np.random.default_rng(0).integers(0, 1024, size=(64, 96)).astype(np.uint16)
+        gains_fxp = [g.get_val() for g in awb_fxp(im, BayerPattern.GRBG)]
+        np.testing.assert_allclose(gains_fxp, awb_np(im, BayerPattern.GRBG), rtol=1e-3)
+
+
 @pytest.mark.benchmark(group="create")
 class TestBenchmarkCreate:
     @staticmethod
@@ -91,3 +274,100 @@ class TestBenchmarkAdd:
         b = np.uint32(1)
 
         benchmark(lambda: a + b)
+
+
+@pytest.mark.benchmark(group="convert")
+class TestBenchmarkConvert:
+    @staticmethod
+    def test_benchmark_fxplite_from_numpy(benchmark):
+        values = np.random.default_rng(0).uniform(0, 1023, size=(256, 256))
+        benchmark(lambda: from_numpy(values, 10, 6))
+
+    @staticmethod
+    def test_benchmark_fxplite_make_fxp(benchmark):
+        values = np.random.default_rng(0).uniform(0, 1023, size=(16, 256)).ravel().tolist()
+        benchmark(lambda: [make_fxp(v, 10, 6) for v in values])
+
+    @staticmethod
+    def test_benchmark_fxp(benchmark):
+        values = np.random.default_rng(0).uniform(0, 1023, size=(256, 256))
+        benchmark(lambda: Fxp(values, signed=False, n_word=16, n_frac=6))
+
+    @staticmethod
+    def test_benchmark_fxplite_from_fxpmath(benchmark):
+        values = np.random.default_rng(0).uniform(0, 1023, size=(256, 256))
+        fxp = Fxp(values, signed=False, n_word=16, n_frac=6)
+        benchmark(lambda: from_fxpmath(fxp))
+
+
+@pytest.mark.benchmark(group="overflow")
+class TestBenchmarkOverflow:
+    @staticmethod
+    @pytest.mark.parametrize("mode", ["off", "count", "saturate", "wrap"])
+    def test_benchmark_fxplite(benchmark, mode):
+        values = np.random.default_rng(0).uniform(0, 1100, size=(512, 512))
+        a = from_numpy(values, 10, 6)
+        benchmark(lambda: FxpliteArray(a.stored_int.copy(), 10, 6, False, 2 ** 6, mode).resolve_overflow())
+
+
+@pytest.mark.benchmark(group="div")
+class TestBenchmarkDiv:
+    @staticmethod
+    def test_benchmark_fxplite(benchmark):
+        a = make_fxp(3.3, 10, 6)
+        b = make_fxp(1.7, 10, 6)
+        benchmark(lambda: a / b)
+
+    @staticmethod
+    def test_benchmark_fxp(benchmark):
+        a = Fxp(3.3, n_int=10, n_frac=6, signed=False)
+        b = Fxp(1.7, n_int=10, n_frac=6, signed=False)
+        benchmark(lambda: a / b)
+
+    @staticmethod
+    def test_benchmark_scalar_int(benchmark):
+        a = 3 << 6
+        b = 1 << 6
+        benchmark(lambda: (a << 6) // b)
+
+
+@pytest.mark.benchmark(group="div-array")
+class TestBenchmarkDivArray:
+    """Cost and accuracy (max error in LSB, in extra_info) per bit width and iteration count"""
+
+    @staticmethod
+    @pytest.mark.parametrize("n_bits", [8, 16, 24])
+    @pytest.mark.parametrize("iterations", [1, 2, 3])
+    def test_benchmark_fxplite_div(benchmark, n_bits, iterations):
+        rng = np.random.default_rng(0)
+        n_frac = n_bits // 2
+        a = FxpliteArray(rng.integers(1, 2 ** n_bits, size=2 ** 16), n_bits - n_frac, n_frac, False, 2 ** n_frac)
+        b = FxpliteArray(rng.integers(1, 2 ** n_bits, size=2 ** 16), n_bits - n_frac, n_frac, False, 2 ** n_frac)
+        q = benchmark(lambda: a.div(b, iterations, exact=False))
+        benchmark.extra_info["max_err_lsb"] = int(np.abs(q.stored_int - (a / b).stored_int).max())
+
+    @staticmethod
+    @pytest.mark.parametrize("n_bits", [8, 16, 24])
+    @pytest.mark.parametrize("iterations", [1, 2, 3])
+    def test_benchmark_fxplite_sqrt(benchmark, n_bits, iterations):
+        rng = np.random.default_rng(0)
+        n_frac = n_bits // 2
+        a = FxpliteArray(rng.integers(1, 2 ** n_bits, size=2 ** 16), n_bits - n_frac, n_frac, False, 2 ** n_frac)
+        r = benchmark(lambda: a.sqrt(iterations, exact=False))
+        benchmark.extra_info["max_err_lsb"] = int(np.abs(r.stored_int - a.sqrt().stored_int).max())
+
+    @staticmethod
+    @pytest.mark.parametrize("n_bits", [8, 16, 24])
+    def test_benchmark_fxplite_div_exact(benchmark, n_bits):
+        rng = np.random.default_rng(0)
+        n_frac = n_bits // 2
+        a = FxpliteArray(rng.integers(1, 2 ** n_bits, size=2 ** 16), n_bits - n_frac, n_frac, False, 2 ** n_frac)
+        b = FxpliteArray(rng.integers(1, 2 ** n_bits, size=2 ** 16), n_bits - n_frac, n_frac, False, 2 ** n_frac)
+        benchmark(lambda: a / b)
+
+    @staticmethod
+    def test_benchmark_numpy_float(benchmark):
+        rng = np.random.default_rng(0)
+        a = rng.uniform(1, 2 ** 8, size=2 ** 16)
+        b = rng.uniform(1, 2 ** 8, size=2 ** 16)
+        benchmark(lambda: a / b)
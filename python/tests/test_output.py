@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from isp_output import to_bit_depth, FrameWriter
+
+
+@pytest.fixture
+def rgb():
+    yield np.random.default_rng(0).integers(0, 1024, size=(16, 24, 3)).astype(np.uint16)
+
+
+class TestBitDepthSpec:
+    @staticmethod
+    def test_10_to_8_bits(rgb):
+        out = np.empty(rgb.shape, dtype=np.uint8)
+        assert to_bit_depth(rgb, out) is out
+        np.testing.assert_equal(out, rgb >> 2)
+
+    @staticmethod
+    def test_10_to_16_bits(rgb):
+        out = np.empty(rgb.shape, dtype=np.uint16)
+        np.testing.assert_equal(to_bit_depth(rgb, out), rgb << 6)
+
+    @staticmethod
+    def test_float_input_is_clipped(rgb):
+        im = rgb.astype(np.float32)
+        im[0, 0] = [-5.0, 1100.0, 512.5]
+        out = to_bit_depth(im, np.empty(rgb.shape, dtype=np.uint8))
+        np.testing.assert_equal(out[0, 0], [0, 255, 128])
+        np.testing.assert_equal(out[1:], rgb[1:] >> 2)
+
+    @staticmethod
+    def test_bgr(rgb):
+        out = to_bit_depth(rgb, np.empty(rgb.shape, dtype=np.uint8), bgr=True)
+        np.testing.assert_equal(out, rgb[..., ::-1] >> 2)
+
+
+class TestFrameWriterSpec:
+    @staticmethod
+    @pytest.mark.parametrize("dtype", [np.uint8, np.uint16])
+    def test_npy_is_memory_mappable(tmp_path, rgb, dtype):
+        with FrameWriter(tmp_path, "npy", dtype) as writer:
+            writer.submit(rgb, "a")
+        im = np.load(tmp_path / "a.npy", mmap_mode="r")
+        assert im.dtype == dtype
+        np.testing.assert_equal(im, to_bit_depth(rgb, np.empty(rgb.shape, dtype=dtype)))
+
+    @staticmethod
+    def test_raw(tmp_path, rgb):
+        with FrameWriter(tmp_path, "raw", np.uint16) as writer:
+            writer.submit(rgb, "a")
+        np.testing.assert_equal(np.fromfile(tmp_path / "a.raw", dtype=np.uint16).reshape(rgb.shape), rgb << 6)
+
+    @staticmethod
+    def test_png(tmp_path, rgb):
+        cv2 = pytest.importorskip("cv2")
+        with FrameWriter(tmp_path, "png", np.uint8) as writer:
+            writer.submit(rgb, "a")
+        im = cv2.imread(str(tmp_path / "a.png"), cv2.IMREAD_UNCHANGED)
+        np.testing.assert_equal(im[..., ::-1], rgb >> 2)
+
+    @staticmethod
+    def test_source_buffer_can_be_reused(tmp_path, rgb):
+        frame = rgb.copy()
+        with FrameWriter(tmp_path, "npy", max_pending=2) as writer:
+            for i in range(6):
+                frame[:] = rgb + i
+                writer(i, frame)
+        assert writer.n_written == 6
+        for i in range(6):
+            np.testing.assert_equal(np.load(tmp_path / f"frame_{i:05d}.npy"), np.minimum(rgb + i, 1023) << 6)
+
+    @staticmethod
+    def test_pipeline_callback(tmp_path):
+        from isp_pipeline import Pipeline
+        from isp_types import BayerPattern
+        frames = [np.random.default_rng(i).integers(0, 1024, size=(32, 48)).astype(np.uint16) for i in range(3)]
+        with FrameWriter(tmp_path, "npy") as writer:
+            Pipeline("numba", BayerPattern.GRBG).run(frames, writer)
+        assert sorted(p.name for p in tmp_path.iterdir()) == [f"frame_{i:05d}.npy" for i in range(3)]
+
+    @staticmethod
+    def test_write_errors_are_raised(tmp_path, rgb):
+        writer = FrameWriter(tmp_path, "npy")
+        writer.submit(rgb, "missing_dir/a")
+        with pytest.raises(OSError):
+            writer.close()
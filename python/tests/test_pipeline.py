@@ -0,0 +1,132 @@
+import os
+
+import numpy as np
+import pytest
+
+from isp_pipeline import Pipeline, run_streams
+from isp_plan import plan_pipeline
+from isp_types import BayerPattern
+
+
+def make_stream(seed, count=3, h=64, w=96):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 1024, size=(h, w)).astype(np.uint16) for _ in range(count)]
+
+
+class TestPipelineSpec:
+    @staticmethod
+    @pytest.mark.parametrize("backend", ["numpy", "numba"])
+    def test_pipelines_do_not_share_buffers(backend):
+        a = Pipeline(backend, BayerPattern.GRBG)
+        b = Pipeline(backend, BayerPattern.GRBG)
+        frame_a, frame_b = make_stream(0, 1)[0], make_stream(1, 1)[0]
+        out_a = a.process(frame_a).copy()
+        b.process(frame_b)
+        np.testing.assert_equal(a.process(frame_a), out_a)
+
+    @staticmethod
+    @pytest.mark.parametrize("backend", ["numba", "fxp"])
+    def test_wb_restarts_from_current_frame(backend):
+        # small frames, the fxp backend runs on fxpmath element by element
+        frame_a, frame_b = make_stream(0, 2, h=8, w=12)
+        # the fxp backend returns a fxpmath.Fxp
+        expected = np.array(Pipeline(backend, BayerPattern.GRBG).process(frame_b))
+        pipeline = Pipeline(backend, BayerPattern.GRBG)
+        pipeline.process(frame_a)
+        np.testing.assert_equal(np.asarray(pipeline.process(frame_b)), expected)
+        np.testing.assert_equal(np.asarray(pipeline.process(frame_b)), expected)
+
+    @staticmethod
+    def test_fxp_backend_runs_all_stages():
+        frame = make_stream(0, 1, h=8, w=12)[0]
+        ccm_mat = np.array([[1100, -50, -26], [-40, 1080, -16], [-10, -60, 1094]], dtype=np.float32)
+        rgb = np.asarray(Pipeline("fxp", BayerPattern.GRBG, ccm_mat).process(frame))
+        assert rgb.shape == (8, 12, 3)
+        assert rgb.min() >= 0 and rgb.max() <= 1023
+
+    @staticmethod
+    @pytest.mark.parametrize("backend", ["numpy", "numba"])
+    def test_concurrent_streams_match_sequential(backend):
+        streams = [make_stream(seed) for seed in range(4)]
+
+        expected = {}
+        for k, stream in enumerate(streams):
+            Pipeline(backend, BayerPattern.GRBG).run(
+                stream, lambda i, rgb: expected.__setitem__((k, i), rgb.copy()))
+
+        results = {}
+        pipelines = [Pipeline(backend, BayerPattern.GRBG) for _ in streams]
+        run_streams(pipelines, streams, lambda k, i, rgb: results.__setitem__((k, i), rgb.copy()))
+
+        assert results.keys() == expected.keys()
+        for key in expected:
+            np.testing.assert_equal(results[key], expected[key])
+        assert all(len(p.timings["total"]) == 3 for p in pipelines)
+
+
+class TestPipelineROISpec:
+    @staticmethod
+    @pytest.mark.parametrize("backend", ["numpy", "numba"])
+    @pytest.mark.parametrize("roi", [(0, 0, 16, 16), (13, 27, 41, 60), (30, 50, 64, 96), (1, 1, 63, 95),
+                                     (20, 30, 21, 31), (21, 31, 22, 32), (62, 94, 64, 96)])
+    def test_roi_matches_full_frame(backend, roi):
+        frame = make_stream(0, 1)[0]
+        ccm_mat = np.array([[1100, -50, -26], [-40, 1080, -16], [-10, -60, 1094]], dtype=np.float32)
+        full = Pipeline(backend, BayerPattern.GRBG, ccm_mat).process(frame).copy()
+
+        pipeline = Pipeline(backend, BayerPattern.GRBG, ccm_mat)
+        y0, x0, y1, x1 = roi
+        np.testing.assert_equal(pipeline.process_roi(frame, roi), full[y0:y1, x0:x1])
+
+    @staticmethod
+    def test_roi_uses_supplied_or_cached_gains():
+        frame = make_stream(0, 1)[0]
+        pipeline = Pipeline("numpy", BayerPattern.GRBG)
+        pipeline.process_roi(frame, (0, 0, 8, 8), gains=(1.0, 1.0))
+        assert pipeline.gains is None
+
+        pipeline.process(frame)
+        gains = pipeline.gains
+        pipeline.process_roi(frame, (0, 0, 8, 8))
+        assert pipeline.gains == gains
+        assert len(pipeline.timings["awb"]) == 1
+
+    @staticmethod
+    def test_roi_uses_supplied_gains_without_awb():
+        frame = make_stream(0, 1)[0]
+        plan = plan_pipeline(["wb", "demos"], frame.shape, gains=(2.0, 2.0))
+        pipeline = Pipeline("numpy", BayerPattern.GRBG, plan=plan)
+        expected = Pipeline("numpy", BayerPattern.GRBG, plan=plan_pipeline(["wb", "demos"], frame.shape,
+                                                                           gains=(1.0, 1.0))).process(frame)
+        np.testing.assert_equal(pipeline.process_roi(frame, (0, 0, 8, 8), gains=(1.0, 1.0)), expected[:8, :8])
+
+    @staticmethod
+    def test_roi_timings_are_separate():
+        from pandas import DataFrame
+        frame = make_stream(0, 1)[0]
+        pipeline = Pipeline("numpy", BayerPattern.GRBG)
+        pipeline.process(frame)
+        pipeline.process_roi(frame, (0, 0, 8, 8))
+        pipeline.process(frame)
+        assert {k: len(v) for k, v in pipeline.timings.items()} == {"total": 2, "awb": 2, "wb": 2, "demos": 2}
+        assert {k: len(v) for k, v in pipeline.roi_timings.items()} == {"total": 1, "wb": 1, "demos": 1}
+        DataFrame(pipeline.timings)
+
+
+@pytest.mark.benchmark(group="streams")
+class TestBenchmarkStreams:
+    """run_streams on the numba backend, with 1 stream and with one stream per core
+
+    The numba kernels release the GIL: on a multi-core machine, N streams should take
+    about as long as one, i.e. the throughput (extra_info["frames"] per round) scales.
+    """
+    @staticmethod
+    @pytest.mark.parametrize("n_streams", [1, max(2, min(os.cpu_count() or 1, 8))])
+    def test_benchmark_numba(benchmark, n_streams):
+        streams = [make_stream(seed, count=4, h=512, w=768) for seed in range(n_streams)]
+        pipelines = [Pipeline("numba", BayerPattern.GRBG) for _ in streams]
+        # compile and allocate the buffers outside of the measurement
+        for pipeline, stream in zip(pipelines, streams):
+            pipeline.process(stream[0])
+        benchmark.extra_info["frames"] = sum(len(stream) for stream in streams)
+        benchmark(lambda: run_streams(pipelines, streams))
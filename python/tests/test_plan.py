@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from isp_plan import plan_pipeline, plan_from_config, roi_input_region
+from isp_pipeline import Pipeline
+from isp_types import BayerPattern
+
+
+@pytest.fixture
+def config():
+    yield {
+        "sensor_info": {"width": 96, "height": 64, "bayer_pattern": "grbg"},
+        "auto_white_balance": {"is_enable": True},
+        "white_balance": {"is_enable": True, "is_auto": True, "r_gain": 1.5, "b_gain": 2.0},
+        "demosaic": {"is_save": False},
+        "color_correction_matrix": {
+            "is_enable": True,
+            "corrected_red": [1024, 0, 0],
+            "corrected_green": [0, 1024, 0],
+            "corrected_blue": [0, 0, 1024],
+        },
+    }
+
+
+class TestPlanSpec:
+    @staticmethod
+    def test_stages_follow_config(config):
+        assert plan_from_config(config).stages == ["awb", "wb", "demos", "ccm"]
+
+        config["color_correction_matrix"]["is_enable"] = False
+        config["white_balance"]["is_auto"] = False
+        plan = plan_from_config(config)
+        assert plan.stages == ["wb", "demos"]
+        assert plan.gains == (1.5, 2.0)
+
+    @staticmethod
+    def test_ccm_needs_demos(config):
+        del config["demosaic"]
+        with pytest.raises(ValueError):
+            plan_from_config(config)
+
+    @staticmethod
+    def test_non_overlapping_buffers_share_arena():
+        plan = plan_pipeline(["awb", "wb", "demos", "ccm"], (64, 96))
+        b = plan.buffers
+        # wb is dead once demos ran, ccm can reuse its memory; demos feeds ccm
+        assert b["ccm"].arena == b["wb"].arena
+        assert b["demos"].arena != b["ccm"].arena
+        assert plan.peak_nbytes == b["demos"].nbytes + b["ccm"].nbytes
+        assert plan.peak_nbytes < plan.naive_nbytes
+
+    @staticmethod
+    def test_allocate_views():
+        plan = plan_pipeline(["awb", "wb", "demos", "ccm"], (64, 96))
+        buffers = plan.allocate()
+        assert buffers["wb"].shape == (64, 96) and buffers["wb"].dtype == np.uint16
+        assert buffers["ccm"].shape == (64, 96, 3) and buffers["ccm"].dtype == np.float32
+        assert np.shares_memory(buffers["wb"], buffers["ccm"])
+
+    @staticmethod
+    @pytest.mark.parametrize("backend", ["numpy", "numba"])
+    def test_planned_pipeline_matches_unplanned(config, backend):
+        rng = np.random.default_rng(0)
+        frame = rng.integers(0, 1024, size=(64, 96)).astype(np.uint16)
+        ccm_mat = np.eye(3, dtype=np.float32) * 1024
+
+        planned = Pipeline.from_config(config, backend)
+        unplanned = Pipeline(backend, BayerPattern.GRBG, ccm_mat)
+        unplanned.buffers.update(ccm=np.zeros((64, 96, 3), dtype=np.float32))
+        np.testing.assert_equal(planned.process(frame), unplanned.process(frame))
+        assert "peak memory" in planned.report()
+
+    @staticmethod
+    def test_roi_region_is_minimal():
+        # demos reads 2px around, aligned to the Bayer quad
+        region, inner = roi_input_region((21, 31, 24, 34), ["wb", "demos"], (64, 96))
+        assert region == (18, 28, 26, 36)
+        assert inner == (3, 3, 6, 6)
+        # clipped to the frame
+        assert roi_input_region((0, 0, 4, 4), ["wb", "demos"], (64, 96))[0] == (0, 0, 6, 6)
+
+    @staticmethod
+    def test_frame_dtype_must_match_plan(config):
+        frame = np.random.default_rng(0).integers(1, 1024, size=(64, 96)).astype(np.float32)
+        pipeline = Pipeline.from_config(config, "numba")
+        with pytest.raises(ValueError, match="dtype"):
+            pipeline.process(frame)
+
+        pipeline = Pipeline.from_config(config, "numba", dtype=np.float32)
+        assert pipeline.plan.buffers["wb"].dtype == np.float32
+        pipeline.process(frame)
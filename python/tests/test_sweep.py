@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from isp_sweep import sweep, pareto_front, format_front, SWEEP_STAGES
+from isp_types import BayerPattern
+
+
+@pytest.fixture
+def grgb_image():
+    rng = np.random.default_rng(0)
+    yield rng.integers(0, 1024, size=(32, 48)).astype(np.uint16)
+
+
+@pytest.fixture
+def ccm_mat():
+    yield np.array([[1100, -50, -26], [-40, 1080, -16], [-10, -60, 1094]], dtype=np.float32)
+
+
+class TestSweepSpec:
+    @staticmethod
+    def test_sweep_covers_grid(grgb_image, ccm_mat):
+        rows = sweep(grgb_image, BayerPattern.GRBG, ccm_mat, n_ints=(8, 12), n_fracs=(0, 4, 8), max_workers=2)
+        assert len(rows) == len(SWEEP_STAGES) * 2 * 3
+        assert {row["stage"] for row in rows} == set(SWEEP_STAGES)
+
+    @staticmethod
+    def test_wide_formats_are_accurate(grgb_image, ccm_mat):
+        rows = sweep(grgb_image, BayerPattern.GRBG, ccm_mat, n_ints=(12,), n_fracs=(12,))
+        errors = {row["stage"]: row["max_err"] for row in rows}
+        assert errors["awb"] < 1e-3
+        # gains are quantized to 2**-12, pixels go up to 1023
+        assert errors["wb"] < 1023 * 2 ** -11
+        assert errors["demos"] < 2 ** -10
+        # the float reference floors ccm outputs to integers
+        assert errors["ccm"] <= 1
+
+    @staticmethod
+    def test_demos_improves_with_fractional_bits(grgb_image, ccm_mat):
+        rows = sweep(grgb_image, BayerPattern.GRBG, ccm_mat, n_ints=(12,), n_fracs=(0, 2, 4, 8), stages=("demos",))
+        errors = [row["max_err"] for row in sorted(rows, key=lambda row: row["n_frac"])]
+        assert errors == sorted(errors, reverse=True) and errors[0] > errors[-1]
+
+    @staticmethod
+    def test_ccm_coefficients_do_not_saturate(grgb_image, ccm_mat):
+        # the coefficients have their own format, 10 integer bits are enough for 10-bit pixels
+        rows = sweep(grgb_image, BayerPattern.GRBG, ccm_mat, n_ints=(10,), n_fracs=(4,), stages=("ccm",))
+        assert rows[0]["max_err"] <= 1
+
+    @staticmethod
+    def test_narrow_formats_saturate(grgb_image, ccm_mat):
+        rows = sweep(grgb_image, BayerPattern.GRBG, ccm_mat, n_ints=(4, 12), n_fracs=(4,), stages=("wb",))
+        narrow, wide = sorted(rows, key=lambda row: row["n_int"])
+        assert narrow["max_err"] > 500 > wide["max_err"]
+
+    @staticmethod
+    def test_pareto_front(grgb_image, ccm_mat):
+        rows = sweep(grgb_image, BayerPattern.GRBG, ccm_mat, n_ints=range(4, 14, 3), n_fracs=range(0, 10, 3))
+        front = pareto_front(rows)
+        assert front.keys() == set(SWEEP_STAGES)
+        for stage, stage_front in front.items():
+            bits = [row["bits"] for row in stage_front]
+            errors = [row["max_err"] for row in stage_front]
+            assert bits == sorted(set(bits))
+            assert errors == sorted(errors, reverse=True)
+            # nothing in the sweep dominates a point of the front
+            for point in stage_front:
+                assert not any(row["stage"] == stage and row["bits"] <= point["bits"]
+                               and row["max_err"] < point["max_err"] for row in rows)
+        assert "psnr" in format_front(front)